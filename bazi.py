@@ -1,7 +1,11 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+import functools
+import itertools
+import sys
+from collections import Counter
+from datetime import datetime, tzinfo
+from typing import Dict, Final, List, Optional, Tuple
 
 from lunar_python import Solar
 
@@ -16,155 +20,416 @@ Gan = str
 Zhi = str
 Pillars = Dict[str, Tuple[Gan, Zhi]]
 
+# Small integer encodings for the 10 Heavenly Stems and 12 Earthly Branches.
+# Relation tables below are indexed by these so the hot loops avoid hashing CJK strings.
+_GANS = "甲乙丙丁戊己庚辛壬癸"
+_ZHIS = "子丑寅卯辰巳午未申酉戌亥"
+_GAN_IDX: Dict[Gan, int] = {g: i for i, g in enumerate(_GANS)}
+_ZHI_IDX: Dict[Zhi, int] = {z: i for i, z in enumerate(_ZHIS)}
+
+# Runtime solar time string, e.g. "2025年3月7日 09:05:00 (Asia/Shanghai)" (printf-style: one C-level pass)
+_SOLAR_STR_FMT = "%d年%d月%d日 %02d:%02d:%02d (%s)"
+
+# Pillar index pairs (i < j) for the standard 年/月/日/时 chart
+_PAIR_IDX_4: Tuple[Tuple[int, int], ...] = ((0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3))
+
+
+def _zhi_mask(zhis) -> int:
+    """Return the 12-bit presence mask (bit i = branch with _ZHI_IDX i) for an iterable of branches."""
+    mask = 0
+    for z in zhis:
+        mask |= 1 << _ZHI_IDX[z]
+    return mask
+
+
+# Relation maps (module constants shared by every BaZiAutomation instance)
+
+# Heavenly Stems (天干) -> Wu Xing
+GAN_WUXING: Final[Dict[Gan, str]] = {
+    "甲": "木", "乙": "木",
+    "丙": "火", "丁": "火",
+    "戊": "土", "己": "土",
+    "庚": "金", "辛": "金",
+    "壬": "水", "癸": "水",
+}
+
+# Earthly Branches (地支) -> Wu Xing
+ZHI_WUXING: Final[Dict[Zhi, str]] = {
+    "子": "水", "丑": "土",
+    "寅": "木", "卯": "木",
+    "辰": "土", "巳": "火",
+    "午": "火", "未": "土",
+    "申": "金", "酉": "金",
+    "戌": "土", "亥": "水",
+}
+
+# Wu Xing generation (生) and overcoming (克) relations
+WUXING_RELATION: Final = {
+    "生": [("木", "火"), ("火", "土"), ("土", "金"), ("金", "水"), ("水", "木")],
+    "克": [("木", "土"), ("土", "水"), ("水", "火"), ("火", "金"), ("金", "木")],
+}
+
+# Hidden stems (地支藏干)
+HIDDEN_STEMS: Final[Dict[Zhi, List[Gan]]] = {
+    "子": ["癸"], "丑": ["己", "癸", "辛"], "寅": ["甲", "丙", "戊"], "卯": ["乙"],
+    "辰": ["戊", "乙", "癸"], "巳": ["丙", "戊", "庚"], "午": ["丁", "己"], "未": ["己", "丁", "乙"],
+    "申": ["庚", "壬", "戊"], "酉": ["辛"], "戌": ["戊", "辛", "丁"], "亥": ["壬", "甲"],
+}
+
+# Heavenly stem relationships
+GAN_REL_MAP: Final = {
+    "chong": [("甲", "庚"), ("乙", "辛"), ("丙", "壬"), ("丁", "癸")],  # 冲
+    "he": [("甲", "己"), ("乙", "庚"), ("丙", "辛"), ("丁", "壬"), ("戊", "癸")],  # 五合
+}
+
+# Five combinations -> transformation element (simplified hinting)
+GAN_HE_HUA: Final[Dict[Tuple[Gan, Gan], str]] = {
+    ("甲", "己"): "土",
+    ("乙", "庚"): "金",
+    ("丙", "辛"): "水",
+    ("丁", "壬"): "木",
+    ("戊", "癸"): "火",
+}
+
+# Earthly branch relationships (pair keys are code-point-sorted tuples; the
+# pair collections are frozensets so membership is a single hash probe)
+ZHI_LIU_HE: Final = {
+    ("丑", "子"): "化土",
+    ("亥", "寅"): "化木",
+    ("卯", "戌"): "化火",
+    ("辰", "酉"): "化金",
+    ("巳", "申"): "化水",
+    ("午", "未"): "化土/火",
+}
+
+ZHI_LIU_CHONG: Final = frozenset({
+    ("午", "子"),
+    ("丑", "未"),
+    ("寅", "申"),
+    ("卯", "酉"),
+    ("戌", "辰"),
+    ("亥", "巳"),
+})
+
+# San He (三合) groups
+ZHI_SAN_HE: Final = {
+    "水局": ["申", "子", "辰"],
+    "木局": ["亥", "卯", "未"],
+    "火局": ["寅", "午", "戌"],
+    "金局": ["巳", "酉", "丑"],
+}
+
+# San Hui (三会) groups
+ZHI_SAN_HUI: Final = {
+    "水会": ["亥", "子", "丑"],
+    "木会": ["寅", "卯", "辰"],
+    "火会": ["巳", "午", "未"],
+    "金会": ["申", "酉", "戌"],
+}
+
+# Xing (刑)
+ZHI_XING: Final = {
+    "无礼刑": [("子", "卯")],
+    "恃势刑": [("寅", "巳"), ("巳", "申"), ("申", "寅")],
+    "丑未戌刑": [("丑", "未"), ("未", "戌"), ("戌", "丑")],
+    "自刑": ["辰", "午", "酉", "亥"],
+}
+
+# Hai (害/穿)
+ZHI_HAI: Final = frozenset({
+    ("子", "未"),
+    ("丑", "午"),
+    ("寅", "巳"),
+    ("卯", "辰"),
+    ("亥", "申"),
+    ("戌", "酉"),
+})
+
+# Po (破)
+ZHI_PO: Final = frozenset({
+    ("子", "酉"),
+    ("午", "卯"),
+    ("巳", "申"),
+    ("亥", "寅"),
+    ("丑", "辰"),
+    ("戌", "未"),
+})
+
+# Stem or branch -> Wu Xing in one map (the two character sets are disjoint)
+_CHAR_WUXING: Final[Dict[str, str]] = {**GAN_WUXING, **ZHI_WUXING}
+
+# Rendered branch half of a pillar line, e.g. "子(水) 地支藏干：['癸']" (depends on the branch only)
+_ZHI_PILLAR_TEXT: Final[Dict[Zhi, str]] = {
+    z: f"{z}({ZHI_WUXING[z]}) 地支藏干：{stems}" for z, stems in HIDDEN_STEMS.items()
+}
+
+
+def _build_ke_msg() -> List[List[Optional[str]]]:
+    """克 message for every ordered stem pair, indexed [a][b] by _GAN_IDX."""
+    ke = frozenset(WUXING_RELATION["克"])
+    table: List[List[Optional[str]]] = [[None] * 10 for _ in range(10)]
+    for gan1, a in _GAN_IDX.items():
+        for gan2, b in _GAN_IDX.items():
+            w1, w2 = GAN_WUXING[gan1], GAN_WUXING[gan2]
+            if (w1, w2) in ke:
+                table[a][b] = f"{gan1}{gan2}相克"
+            elif (w2, w1) in ke:
+                table[a][b] = f"{gan2}{gan1}相克"
+    return table
+
+
+_KE_MSG: Final = _build_ke_msg()
+
+
+def _build_gan_pair_labels() -> List[Optional[str]]:
+    """
+    Stem relation label for every ordered stem pair, indexed by a * 10 + b (a, b from _GAN_IDX).
 
-class BaZiAutomation:
+    Resolves the 冲 > 五合 > 克 precedence once, so the analyzer does a single lookup per pair.
     """
-    Utilities for generating BaZi (Four Pillars) structured signals and a formatted prompt.
+    table: List[Optional[str]] = [None] * 100
+    for a in range(10):
+        for b in range(10):
+            if _KE_MSG[a][b]:
+                table[a * 10 + b] = "天干"
+    for he_pair in GAN_REL_MAP["he"]:
+        a, b = _GAN_IDX[he_pair[0]], _GAN_IDX[he_pair[1]]
+        table[a * 10 + b] = table[b * 10 + a] = "天干五合化" + GAN_HE_HUA.get(tuple(he_pair), "")
+    for g1, g2 in GAN_REL_MAP["chong"]:
+        a, b = _GAN_IDX[g1], _GAN_IDX[g2]
+        table[a * 10 + b] = table[b * 10 + a] = "天干相冲"
+    return table
 
-    The implementation focuses on:
-      - Five Elements (Wu Xing) mappings and relations
-      - Stem/Branch relationship detection (he/chong/xing/hai/po, etc.)
-      - Runtime "current year / Liu Nian" computation in a specified timezone
+
+_GAN_PAIR_LABELS: Final = _build_gan_pair_labels()
+
+
+def _build_gan_he_bits() -> int:
+    """100-bit mask with bit a * 10 + b set (in both orders) for every 五合 pair, a, b from _GAN_IDX."""
+    bits = 0
+    for g1, g2 in GAN_REL_MAP["he"]:
+        a, b = _GAN_IDX[g1], _GAN_IDX[g2]
+        bits |= (1 << (a * 10 + b)) | (1 << (b * 10 + a))
+    return bits
+
+
+_GAN_HE_BITS: Final = _build_gan_he_bits()
+
+
+def _compute_an_he(zhi1: Zhi, zhi2: Zhi) -> Optional[str]:
+    """Run the hidden stem matching behind BaZiAutomation.check_an_he (used once per pair to fill _AN_HE)."""
+    stems1 = HIDDEN_STEMS.get(zhi1, [])
+    stems2 = HIDDEN_STEMS.get(zhi2, [])
+
+    found: List[str] = []
+    for s1 in stems1:
+        row = _GAN_IDX[s1] * 10
+        for s2 in stems2:
+            if _GAN_HE_BITS >> (row + _GAN_IDX[s2]) & 1:
+                found.append(f"{s1}{s2}合")
+
+    if found:
+        return f"暗合(藏干{','.join(found)})"
+    return None
+
+
+# 暗合 result for every ordered branch pair (hidden stems are static)
+_AN_HE: Final[Dict[Tuple[Zhi, Zhi], Optional[str]]] = {
+    (z1, z2): _compute_an_he(z1, z2) for z1 in _ZHI_IDX for z2 in _ZHI_IDX
+}
+
+
+def _build_zhi_pair_labels() -> List[Tuple[str, ...]]:
     """
+    Resolved message labels for every ordered branch pair, indexed by a * 12 + b (a, b from _ZHI_IDX).
 
-    def __init__(self) -> None:
-        # Heavenly Stems (天干) -> Wu Xing
-        self.gan_wuxing: Dict[Gan, str] = {
-            "甲": "木", "乙": "木",
-            "丙": "火", "丁": "火",
-            "戊": "土", "己": "土",
-            "庚": "金", "辛": "金",
-            "壬": "水", "癸": "水",
-        }
+    The " (loc1-loc2)" suffix is added per chart.
+    """
+    table: List[Tuple[str, ...]] = [()] * 144
+    for z1, a in _ZHI_IDX.items():
+        for z2, b in _ZHI_IDX.items():
+            pair_key = (z1, z2) if z1 < z2 else (z2, z1)
+            labels: List[str] = []
+
+            liu_he = ZHI_LIU_HE.get(pair_key)
+            if liu_he is not None:
+                labels.append(f"地支六合{liu_he}")
+            if pair_key in ZHI_LIU_CHONG:
+                labels.append("地支相冲")
+            if pair_key in ZHI_HAI:
+                labels.append("地支相害")
+            if pair_key in ZHI_PO:
+                labels.append("地支相破")
+
+            an_he = _AN_HE[(z1, z2)]
+            if an_he and liu_he is None:
+                labels.append(f"地支{an_he}")
+
+            if z1 == z2 and z1 in ZHI_XING["自刑"]:
+                labels.append("地支自刑")
+
+            table[a * 12 + b] = tuple(labels)
+    return table
+
+
+_ZHI_PAIR_LABELS: Final = _build_zhi_pair_labels()
+
+# Presence masks for the multi-branch 刑 checks; 寅巳申 is reported by the first match only
+_YIN_SI_SHEN_XING: Final[Tuple[Tuple[int, str], ...]] = (
+    (_zhi_mask("寅巳申"), "地支【寅巳申】三刑俱全 (无恩之刑)"),
+    (_zhi_mask("寅巳"), "地支【寅巳】相刑"),
+    (_zhi_mask("巳申"), "地支【巳申】相刑"),
+    (_zhi_mask("申寅"), "地支【寅申】相刑"),
+)
+_CHOU_WEI_XU_MASK: Final = _zhi_mask("丑未戌")
+
+# San He forms keyed by the present subset of each group's mask:
+# all three -> 成局, head+mid / mid+tail -> 半合, head+tail -> 拱合
+_SAN_HE_FORMS: Final[Tuple[Tuple[int, Dict[int, str]], ...]] = tuple(
+    (
+        _zhi_mask((head, mid, tail)),
+        {
+            _zhi_mask((head, mid, tail)): f"地支三合{label} (成局)",
+            _zhi_mask((head, mid)): f"地支半合{label}",
+            _zhi_mask((mid, tail)): f"地支半合{label}",
+            _zhi_mask((head, tail)): f"地支拱合{label} (缺中神)",
+        },
+    )
+    for label, (head, mid, tail) in ZHI_SAN_HE.items()
+)
+
+# San Hui forms: all three -> 三会, adjacent pair -> 半会, head+tail -> 拱会
+_SAN_HUI_FORMS: Final[Tuple[Tuple[int, Dict[int, str]], ...]] = tuple(
+    (
+        _zhi_mask((head, mid, tail)),
+        {
+            _zhi_mask((head, mid, tail)): f"地支三会{label} (一方之气)",
+            _zhi_mask((head, mid)): f"地支半会{label} (同气)",
+            _zhi_mask((mid, tail)): f"地支半会{label} (同气)",
+            _zhi_mask((head, tail)): f"地支拱会{label}",
+        },
+    )
+    for label, (head, mid, tail) in ZHI_SAN_HUI.items()
+)
+
+
+@functools.lru_cache(maxsize=16)
+def _tz(tz_name: str) -> tzinfo:
+    """Return a cached tzinfo (ZoneInfo, or pytz on older Python) for an IANA timezone name."""
+    if _HAS_ZONEINFO:
+        return ZoneInfo(tz_name)
+
+    # Fallback for older Python: pip install pytz
+    import pytz  # type: ignore
+    return pytz.timezone(tz_name)
+
+
+@functools.lru_cache(maxsize=4096)
+def _eight_char(
+    year: int,
+    month: int,
+    day: int,
+    hour: int,
+    minute: int,
+    gender_code: int,
+) -> Tuple[Tuple[Tuple[Gan, Zhi], ...], str]:
+    """
+    Compute the four pillars and the formatted DaYun sequence for a birth datetime.
 
-        # Earthly Branches (地支) -> Wu Xing
-        self.zhi_wuxing: Dict[Zhi, str] = {
-            "子": "水", "丑": "土",
-            "寅": "木", "卯": "木",
-            "辰": "土", "巳": "火",
-            "午": "火", "未": "土",
-            "申": "金", "酉": "金",
-            "戌": "土", "亥": "水",
-        }
+    Cached per birth tuple and shared by all BaZiAutomation instances.
 
-        # Wu Xing generation (生) and overcoming (克) relations
-        self.wuxing_relation = {
-            "生": [("木", "火"), ("火", "土"), ("土", "金"), ("金", "水"), ("水", "木")],
-            "克": [("木", "土"), ("土", "水"), ("水", "火"), ("火", "金"), ("金", "木")],
-        }
+    Args:
+        year, month, day, hour, minute: Gregorian birth datetime components.
+        gender_code: 1 for male, 0 for female (lunar_python's Yun convention).
 
-        # Hidden stems (地支藏干)
-        self.hidden_stems: Dict[Zhi, List[Gan]] = {
-            "子": ["癸"], "丑": ["己", "癸", "辛"], "寅": ["甲", "丙", "戊"], "卯": ["乙"],
-            "辰": ["戊", "乙", "癸"], "巳": ["丙", "戊", "庚"], "午": ["丁", "己"], "未": ["己", "丁", "乙"],
-            "申": ["庚", "壬", "戊"], "酉": ["辛"], "戌": ["戊", "辛", "丁"], "亥": ["壬", "甲"],
-        }
+    Returns:
+        ((year, month, day, time) pillars as (gan, zhi) tuples, DaYun lines joined by newlines)
+    """
+    solar = Solar.fromYmdHms(year, month, day, hour, minute, 0)
+    lunar = solar.getLunar()
+    bazi = lunar.getEightChar()
+    bazi.setSect(1)
+
+    # Intern the lunar_python outputs so later lookups against the (interned) literal
+    # dict keys short-circuit on identity instead of comparing string contents.
+    intern = sys.intern
+    pillars = (
+        (intern(bazi.getYearGan()), intern(bazi.getYearZhi())),
+        (intern(bazi.getMonthGan()), intern(bazi.getMonthZhi())),
+        (intern(bazi.getDayGan()), intern(bazi.getDayZhi())),
+        (intern(bazi.getTimeGan()), intern(bazi.getTimeZhi())),
+    )
+
+    # DaYun
+    yun = bazi.getYun(gender_code)
+    da_yun_list = yun.getDaYun()
+    da_yun_str: List[str] = []
+    for i in range(1, 9):
+        dy = da_yun_list[i]
+        da_yun_str.append(
+            f"({dy.getGanZhi()}, {dy.getStartAge()}-{dy.getStartAge()+9}岁, {dy.getStartYear()}-{dy.getStartYear()+9}年)"
+        )
 
-        # Heavenly stem relationships
-        self.gan_rel_map = {
-            "chong": [("甲", "庚"), ("乙", "辛"), ("丙", "壬"), ("丁", "癸")],  # 冲
-            "he": [("甲", "己"), ("乙", "庚"), ("丙", "辛"), ("丁", "壬"), ("戊", "癸")],  # 五合
-        }
+    return pillars, "\n".join(da_yun_str)
 
-        # Five combinations -> transformation element (simplified hinting)
-        self.gan_he_hua: Dict[Tuple[Gan, Gan], str] = {
-            ("甲", "己"): "土",
-            ("乙", "庚"): "金",
-            ("丙", "辛"): "水",
-            ("丁", "壬"): "木",
-            ("戊", "癸"): "火",
-        }
 
-        # Precompute a canonical set for quick "he" checks in hidden stem matching
-        self._gan_he_canon = {tuple(sorted(p)) for p in self.gan_rel_map["he"]}
-
-        # Earthly branch relationships
-        self.zhi_liu_he = {
-            frozenset(["子", "丑"]): "化土",
-            frozenset(["寅", "亥"]): "化木",
-            frozenset(["卯", "戌"]): "化火",
-            frozenset(["辰", "酉"]): "化金",
-            frozenset(["巳", "申"]): "化水",
-            frozenset(["午", "未"]): "化土/火",
-        }
+@functools.lru_cache(maxsize=64)
+def _li_chun(year: int) -> Tuple[int, int, int, int, int, int]:
+    """Return LiChun (立春) of a Gregorian year as a (Y, M, D, h, m, s) tuple in lunar_python's local time."""
+    solar = Solar.fromYmd(year, 6, 1).getLunar().getJieQiTable()["立春"]
+    return (
+        solar.getYear(), solar.getMonth(), solar.getDay(),
+        solar.getHour(), solar.getMinute(), solar.getSecond(),
+    )
 
-        self.zhi_liu_chong = [
-            frozenset(["子", "午"]),
-            frozenset(["丑", "未"]),
-            frozenset(["寅", "申"]),
-            frozenset(["卯", "酉"]),
-            frozenset(["辰", "戌"]),
-            frozenset(["巳", "亥"]),
-        ]
-
-        # San He (三合) groups
-        self.zhi_san_he = {
-            "水局": ["申", "子", "辰"],
-            "木局": ["亥", "卯", "未"],
-            "火局": ["寅", "午", "戌"],
-            "金局": ["巳", "酉", "丑"],
-        }
 
-        # San Hui (三会) groups
-        self.zhi_san_hui = {
-            "水会": ["亥", "子", "丑"],
-            "木会": ["寅", "卯", "辰"],
-            "火会": ["巳", "午", "未"],
-            "金会": ["申", "酉", "戌"],
-        }
+@functools.lru_cache(maxsize=48)
+def _lunar_full_string(year: int, month: int, day: int, hour: int) -> str:
+    """Return the lunar calendar description for an hour (it only changes with the date and 时辰)."""
+    lunar = Solar.fromYmdHms(year, month, day, hour, 0, 0).getLunar()
+    return lunar.toFullString() if hasattr(lunar, "toFullString") else str(lunar)
 
-        # Xing (刑)
-        self.zhi_xing = {
-            "无礼刑": [("子", "卯")],
-            "恃势刑": [("寅", "巳"), ("巳", "申"), ("申", "寅")],
-            "丑未戌刑": [("丑", "未"), ("未", "戌"), ("戌", "丑")],
-            "自刑": ["辰", "午", "酉", "亥"],
-        }
 
-        # Hai (害/穿)
-        self.zhi_hai = [
-            frozenset(["子", "未"]),
-            frozenset(["丑", "午"]),
-            frozenset(["寅", "巳"]),
-            frozenset(["卯", "辰"]),
-            frozenset(["申", "亥"]),
-            frozenset(["酉", "戌"]),
-        ]
-
-        # Po (破)
-        self.zhi_po = [
-            frozenset(["子", "酉"]),
-            frozenset(["午", "卯"]),
-            frozenset(["巳", "申"]),
-            frozenset(["寅", "亥"]),
-            frozenset(["辰", "丑"]),
-            frozenset(["戌", "未"]),
-        ]
+class BaZiAutomation:
+    """
+    Utilities for generating BaZi (Four Pillars) structured signals and a formatted prompt.
+
+    The implementation focuses on:
+      - Five Elements (Wu Xing) mappings and relations
+      - Stem/Branch relationship detection (he/chong/xing/hai/po, etc.)
+      - Runtime "current year / Liu Nian" computation in a specified timezone
+    """
+
+    # Public relation maps, kept as attributes for API compatibility (shared module constants)
+    gan_wuxing = GAN_WUXING
+    zhi_wuxing = ZHI_WUXING
+    wuxing_relation = WUXING_RELATION
+    hidden_stems = HIDDEN_STEMS
+    gan_rel_map = GAN_REL_MAP
+    gan_he_hua = GAN_HE_HUA
+    zhi_liu_he = ZHI_LIU_HE
+    zhi_liu_chong = ZHI_LIU_CHONG
+    zhi_san_he = ZHI_SAN_HE
+    zhi_san_hui = ZHI_SAN_HUI
+    zhi_xing = ZHI_XING
+    zhi_hai = ZHI_HAI
+    zhi_po = ZHI_PO
 
     def _now_in_tz(self, tz_name: str) -> datetime:
         """Return timezone-aware current datetime in the given timezone."""
-        if _HAS_ZONEINFO:
-            return datetime.now(ZoneInfo(tz_name))
-
-        # Fallback for older Python: pip install pytz
-        import pytz  # type: ignore
-        return datetime.now(pytz.timezone(tz_name))
+        return datetime.now(_tz(tz_name))
 
     def _ensure_tz(self, dt: datetime, tz_name: str) -> datetime:
         """Ensure a datetime is timezone-aware; if naive, attach tz_name."""
         if dt.tzinfo is not None:
             return dt
-
-        if _HAS_ZONEINFO:
-            return dt.replace(tzinfo=ZoneInfo(tz_name))
-
-        import pytz  # type: ignore
-        return dt.replace(tzinfo=pytz.timezone(tz_name))
+        return dt.replace(tzinfo=_tz(tz_name))
 
     def get_runtime_year_info(
         self,
         as_of: Optional[datetime] = None,
         tz_name: str = "Asia/Shanghai",
+        include_lunar: bool = True,
     ) -> Dict[str, str | int | datetime]:
         """
         Compute runtime (current) Gregorian time and Liu Nian (流年, year pillar) in a given timezone.
@@ -177,6 +442,8 @@ class BaZiAutomation:
             as_of: Optional datetime override for reproducibility/testing.
                    If naive, tz_name is attached.
             tz_name: IANA timezone name (default: Asia/Shanghai).
+            include_lunar: Whether to render current_lunar_str (lunar_python toFullString).
+                           Callers that only need the solar string and Liu Nian can skip it.
 
         Returns:
             A dict containing:
@@ -184,45 +451,38 @@ class BaZiAutomation:
               - tz_name (str)
               - current_gregorian_year (int)
               - current_solar_str (str)
-              - current_lunar_str (str)
+              - current_lunar_str (str, only when include_lunar is True)
               - liu_nian_ganzhi (str)
               - liu_nian_gan / liu_nian_zhi (str)
               - liu_nian_gan_wuxing / liu_nian_zhi_wuxing (str)
         """
         now = self._ensure_tz(as_of, tz_name) if as_of is not None else self._now_in_tz(tz_name)
 
-        solar_now = Solar.fromYmdHms(
-            now.year, now.month, now.day,
-            now.hour, now.minute, now.second,
-        )
-        lunar_now = solar_now.getLunar()
-        ec_now = lunar_now.getEightChar()
-        ec_now.setSect(1)
-
-        ly_gan: Gan = ec_now.getYearGan()
-        ly_zhi: Zhi = ec_now.getYearZhi()
+        # The year pillar only flips at the exact LiChun instant, so compare against the
+        # cached LiChun of this Gregorian year instead of solving the calendar per call.
+        now_tuple = (now.year, now.month, now.day, now.hour, now.minute, now.second)
+        gz_year = now.year if now_tuple >= _li_chun(now.year) else now.year - 1
+        ly_gan: Gan = sys.intern(_GANS[(gz_year - 4) % 10])
+        ly_zhi: Zhi = sys.intern(_ZHIS[(gz_year - 4) % 12])
 
-        return {
+        info: Dict[str, str | int | datetime] = {
             "now": now,
             "tz_name": tz_name,
             "current_gregorian_year": now.year,
-            "current_solar_str": f"{now.year}年{now.month}月{now.day}日 {now.hour:02d}:{now.minute:02d}:{now.second:02d} ({tz_name})",
-            "current_lunar_str": lunar_now.toFullString() if hasattr(lunar_now, "toFullString") else str(lunar_now),
+            "current_solar_str": _SOLAR_STR_FMT % (now.year, now.month, now.day, now.hour, now.minute, now.second, tz_name),
             "liu_nian_ganzhi": f"{ly_gan}{ly_zhi}",
             "liu_nian_gan": ly_gan,
             "liu_nian_zhi": ly_zhi,
             "liu_nian_gan_wuxing": self.gan_wuxing.get(ly_gan, ""),
             "liu_nian_zhi_wuxing": self.zhi_wuxing.get(ly_zhi, ""),
         }
+        if include_lunar:
+            info["current_lunar_str"] = _lunar_full_string(now.year, now.month, now.day, now.hour)
+        return info
 
     def check_wuxing_ke(self, gan1: Gan, gan2: Gan) -> Optional[str]:
         """Return a short message if two stems form a Wu Xing overcoming (克) relation."""
-        w1, w2 = self.gan_wuxing[gan1], self.gan_wuxing[gan2]
-        if (w1, w2) in self.wuxing_relation["克"]:
-            return f"{gan1}{gan2}相克"
-        if (w2, w1) in self.wuxing_relation["克"]:
-            return f"{gan2}{gan1}相克"
-        return None
+        return _KE_MSG[_GAN_IDX[gan1]][_GAN_IDX[gan2]]
 
     def check_an_he(self, zhi1: Zhi, zhi2: Zhi) -> Optional[str]:
         """
@@ -230,19 +490,9 @@ class BaZiAutomation:
 
         We detect whether any hidden stem pair forms one of the Heavenly Stem Five Combinations (天干五合).
         This is a simplified heuristic used as a hint, not a full-rule adjudication.
+        Results for all 144 branch pairs are precomputed at import (_AN_HE).
         """
-        stems1 = self.hidden_stems.get(zhi1, [])
-        stems2 = self.hidden_stems.get(zhi2, [])
-
-        found: List[str] = []
-        for s1 in stems1:
-            for s2 in stems2:
-                if tuple(sorted([s1, s2])) in self._gan_he_canon:
-                    found.append(f"{s1}{s2}合")
-
-        if found:
-            return f"暗合(藏干{','.join(found)})"
-        return None
+        return _AN_HE.get((zhi1, zhi2))
 
     def analyze_detailed_relations(self, pillars: Pillars) -> List[str]:
         """
@@ -252,120 +502,61 @@ class BaZiAutomation:
             pillars: dict like {'年':('辛','巳'), '月':('丁','酉'), '日':('甲','子'), '时':('丙','午')}
 
         Returns:
-            A de-duplicated list of relationship notes (Chinese labels kept for compactness).
+            A sorted, duplicate-free list of relationship notes (Chinese labels kept for compactness).
         """
         messages: List[str] = []
 
-        gans: List[Tuple[str, Gan]] = []
-        zhis: List[Tuple[str, Zhi]] = []
-        for loc, (g, z) in pillars.items():
-            gans.append((loc, g))
-            zhis.append((loc, z))
-
-        # 1) Heavenly stem relations (pairwise)
-        for i in range(len(gans)):
-            for j in range(i + 1, len(gans)):
-                loc1, g1 = gans[i]
-                loc2, g2 = gans[j]
-                pair_sorted = tuple(sorted([g1, g2]))
-
-                relation_found = False
-
-                # Chong (冲)
-                for chong_pair in self.gan_rel_map["chong"]:
-                    if pair_sorted == tuple(sorted(chong_pair)):
-                        messages.append(f"天干相冲 ({loc1}-{loc2})")
-                        relation_found = True
-
-                # He (合)
-                for he_pair in self.gan_rel_map["he"]:
-                    if pair_sorted == tuple(sorted(he_pair)):
-                        hua = self.gan_he_hua.get(tuple(he_pair), "")
-                        messages.append(f"天干五合化{hua} ({loc1}-{loc2})")
-                        relation_found = True
-
-                # Ke (克) as a fallback hint when no chong/he found
-                if not relation_found:
-                    ke_msg = self.check_wuxing_ke(g1, g2)
-                    if ke_msg:
-                        messages.append(f"天干 ({loc1}-{loc2})")
-
-        # 2) Earthly branch relations
-        zhi_list: List[Zhi] = [z for _, z in zhis]
-
-        # 2.1 Pairwise relations (六合/六冲/害/破/暗合/自刑)
-        for i in range(len(zhis)):
-            for j in range(i + 1, len(zhis)):
-                loc1, z1 = zhis[i]
-                loc2, z2 = zhis[j]
-                pair_set = frozenset([z1, z2])
-
-                if pair_set in self.zhi_liu_he:
-                    messages.append(f"地支六合{self.zhi_liu_he[pair_set]} ({loc1}-{loc2})")
-
-                if pair_set in self.zhi_liu_chong:
-                    messages.append(f"地支相冲 ({loc1}-{loc2})")
-
-                if pair_set in self.zhi_hai:
-                    messages.append(f"地支相害 ({loc1}-{loc2})")
-
-                if pair_set in self.zhi_po:
-                    messages.append(f"地支相破 ({loc1}-{loc2})")
-
-                an_he = self.check_an_he(z1, z2)
-                if an_he and pair_set not in self.zhi_liu_he:
-                    messages.append(f"地支{an_he} ({loc1}-{loc2})")
-
-                if z1 == z2 and z1 in self.zhi_xing["自刑"]:
-                    messages.append(f"地支自刑 ({loc1}-{loc2})")
+        locs: List[str] = list(pillars)
+        gan_idxs: List[int] = [_GAN_IDX[g] for g, _ in pillars.values()]
+        zhi_idxs: List[int] = [_ZHI_IDX[z] for _, z in pillars.values()]
+
+        # A regular chart has exactly four pillars, i.e. a fixed sequence of six pairs.
+        pair_idx = _PAIR_IDX_4 if len(locs) == 4 else tuple(itertools.combinations(range(len(locs)), 2))
+
+        # 1) Heavenly stem relations (pairwise): 冲 / 合, else 克 as a fallback hint
+        # 2.1) Earthly branch pairwise relations (六合/六冲/害/破/暗合/自刑)
+        # Both scans run over integer codes only.
+        # Every pairwise note is a constant label plus the pair suffix, formatted once per pair.
+        gan_pair_labels, zhi_pair_labels = _GAN_PAIR_LABELS, _ZHI_PAIR_LABELS
+        for i, j in pair_idx:
+            suffix = f" ({locs[i]}-{locs[j]})"
+
+            gan_label = gan_pair_labels[gan_idxs[i] * 10 + gan_idxs[j]]
+            if gan_label is not None:
+                messages.append(gan_label + suffix)
+
+            for label in zhi_pair_labels[zhi_idxs[i] * 12 + zhi_idxs[j]]:
+                messages.append(label + suffix)
 
         # 2.2 Multi-branch xing patterns (simplified reporting)
-        present_zhis = set(zhi_list)
-        if {"寅", "巳", "申"}.issubset(present_zhis):
-            messages.append("地支【寅巳申】三刑俱全 (无恩之刑)")
-        elif "寅" in present_zhis and "巳" in present_zhis:
-            messages.append("地支【寅巳】相刑")
-        elif "巳" in present_zhis and "申" in present_zhis:
-            messages.append("地支【巳申】相刑")
-        elif "申" in present_zhis and "寅" in present_zhis:
-            messages.append("地支【寅申】相刑")
-
-        if {"丑", "未", "戌"}.issubset(present_zhis):
+        present_mask = 0
+        for a in zhi_idxs:
+            present_mask |= 1 << a
+
+        for xing_mask, msg in _YIN_SI_SHEN_XING:
+            if present_mask & xing_mask == xing_mask:
+                messages.append(msg)
+                break
+
+        if present_mask & _CHOU_WEI_XU_MASK == _CHOU_WEI_XU_MASK:
             messages.append("地支【丑未戌】三刑俱全 (恃势之刑)")
 
-        # 2.3 San He (三合) and partial forms
-        for label, group in self.zhi_san_he.items():
-            found_items = [item for item in group if item in zhi_list]
-            found_items = sorted(list(set(found_items)), key=group.index)
-            count = len(found_items)
-
-            if count == 3:
-                messages.append(f"地支三合{label} (成局)")
-            elif count == 2:
-                s = "".join(found_items)
-                if s == group[0] + group[1]:
-                    messages.append(f"地支半合{label}")
-                elif s == group[1] + group[2]:
-                    messages.append(f"地支半合{label}")
-                elif s == group[0] + group[2]:
-                    messages.append(f"地支拱合{label} (缺中神)")
-
-        # 2.4 San Hui (三会) and partial forms
-        for label, group in self.zhi_san_hui.items():
-            present = [z for z in group if z in zhi_list]
-            present = sorted(list(set(present)), key=group.index)
-
-            if len(present) == 3:
-                messages.append(f"地支三会{label} (一方之气)")
-            elif len(present) == 2:
-                s = "".join(present)
-                if abs(group.index(present[0]) - group.index(present[1])) == 2:
-                    messages.append(f"地支拱会{label}")
-                else:
-                    messages.append(f"地支半会{label} (同气)")
-
-        # De-duplicate while keeping output stable-ish
-        return sorted(set(messages))
+        # 2.3 San He (三合) and partial forms, identified by which group bits are present
+        for group_mask, forms in _SAN_HE_FORMS:
+            msg = forms.get(present_mask & group_mask)
+            if msg is not None:
+                messages.append(msg)
+
+        # 2.4 San Hui (三会) and partial forms, identified the same way
+        for group_mask, forms in _SAN_HUI_FORMS:
+            msg = forms.get(present_mask & group_mask)
+            if msg is not None:
+                messages.append(msg)
+
+        # Every note embeds its own pillar pair or group label, so the list is already
+        # duplicate-free; sort in place (code point order) for stable output.
+        messages.sort()
+        return messages
 
     def generate_prompt(
         self,
@@ -388,64 +579,67 @@ class BaZiAutomation:
         Returns:
             A multi-section prompt string (Chinese section titles retained).
         """
-        solar = Solar.fromYmdHms(year, month, day, hour, minute, 0)
-        lunar = solar.getLunar()
-        bazi = lunar.getEightChar()
-
-        gender_norm = gender_str.strip().lower()
-        gender_code = 1 if gender_norm == "male" else 0
-        bazi.setSect(1)
-
-        year_gan, year_zhi = bazi.getYearGan(), bazi.getYearZhi()
-        month_gan, month_zhi = bazi.getMonthGan(), bazi.getMonthZhi()
-        day_gan, day_zhi = bazi.getDayGan(), bazi.getDayZhi()
-        hour_gan, hour_zhi = bazi.getTimeGan(), bazi.getTimeZhi()
-
-        pillars: Pillars = {
-            "年": (year_gan, year_zhi),
-            "月": (month_gan, month_zhi),
-            "日": (day_gan, day_zhi),
-            "时": (hour_gan, hour_zhi),
-        }
+        static = _static_prompt(year, month, day, hour, minute, gender_str)
+        # Section 5 only uses the solar string and Liu Nian, so skip the lunar rendering.
+        runtime = self.get_runtime_year_info(tz_name=runtime_tz, include_lunar=False)
+
+        prompt = f"""{static}
+
+5. 当前时间（以运行时系统时间为准）
+当前公历时间: {runtime["current_solar_str"]}
+当前流年(年柱干支): {runtime["liu_nian_ganzhi"]}
+流年五行: 天干{runtime["liu_nian_gan"]}[{runtime["liu_nian_gan_wuxing"]}] / 地支{runtime["liu_nian_zhi"]}[{runtime["liu_nian_zhi_wuxing"]}]"""
 
-        relation_notes = self.analyze_detailed_relations(pillars)
+        return prompt
 
-        # Visible Wu Xing counts (stems + branches only; no hidden stems, no transformations)
-        all_chars = [c for p in pillars.values() for c in p]
-        wuxing_list = [self.gan_wuxing.get(c, self.zhi_wuxing.get(c)) for c in all_chars]
-        wuxing_count = {x: wuxing_list.count(x) for x in ["金", "木", "水", "火", "土"]}
 
-        # DaYun
-        yun = bazi.getYun(gender_code)
-        da_yun_list = yun.getDaYun()
-        da_yun_str: List[str] = []
-        for i in range(1, 9):
-            dy = da_yun_list[i]
-            da_yun_str.append(
-                f"({dy.getGanZhi()}, {dy.getStartAge()}-{dy.getStartAge()+9}岁, {dy.getStartYear()}-{dy.getStartYear()+9}年)"
-            )
-        da_yun_sequence = "\n".join(da_yun_str)
+@functools.lru_cache(maxsize=4096)
+def _static_prompt(
+    year: int,
+    month: int,
+    day: int,
+    hour: int,
+    minute: int,
+    gender_str: str,
+) -> str:
+    """
+    Build sections 1-4 of the prompt (basic info, pillars, relations, DaYun).
+
+    These depend only on the birth data, so they are cached per birth tuple and shared by all
+    BaZiAutomation instances; generate_prompt only rebuilds the runtime Liu Nian block per call.
+    """
+    gender_norm = gender_str.strip().lower()
+    gender_code = 1 if gender_norm == "male" else 0
 
-        gan_relations = [r for r in relation_notes if "天干" in r]
-        zhi_relations = [r for r in relation_notes if "地支" in r]
-        gan_relations_str = "\n".join(gan_relations) if gan_relations else "无明显冲合"
-        zhi_relations_str = "\n".join(zhi_relations) if zhi_relations else "无明显关系"
+    chart, da_yun_sequence = _eight_char(year, month, day, hour, minute, gender_code)
+    pillars: Pillars = dict(zip(("年", "月", "日", "时"), chart))
 
-        hour_str = f"{hour:02d}"
-        minute_str = f"{minute:02d}"
+    # BaZiAutomation holds no per-instance state, so a throwaway instance is free
+    relation_notes = BaZiAutomation().analyze_detailed_relations(pillars)
 
-        runtime = self.get_runtime_year_info(tz_name=runtime_tz)
+    # Visible Wu Xing counts (stems + branches only; no hidden stems, no transformations)
+    tally = Counter(map(_CHAR_WUXING.__getitem__, itertools.chain.from_iterable(chart)))
+    wuxing_count = {x: tally[x] for x in ("金", "木", "水", "火", "土")}
 
-        prompt = f"""
+    gan_relations = [r for r in relation_notes if "天干" in r]
+    zhi_relations = [r for r in relation_notes if "地支" in r]
+    gan_relations_str = "\n".join(gan_relations) if gan_relations else "无明显冲合"
+    zhi_relations_str = "\n".join(zhi_relations) if zhi_relations else "无明显关系"
+
+    hour_str = f"{hour:02d}"
+    minute_str = f"{minute:02d}"
+
+    pillar_lines = "\n".join(
+        f"{loc}柱： {g}({GAN_WUXING[g]})|{_ZHI_PILLAR_TEXT[z]}" for loc, (g, z) in pillars.items()
+    )
+
+    prompt = f"""
 1. 基础信息
 性别: {gender_norm}
 公历: {year}年{month}月{day}日{hour_str}:{minute_str}
 
 2. 八字排盘
-年柱： {year_gan}({self.gan_wuxing[year_gan]})|{year_zhi}({self.zhi_wuxing[year_zhi]}) 地支藏干：{self.hidden_stems[year_zhi]}
-月柱： {month_gan}({self.gan_wuxing[month_gan]})|{month_zhi}({self.zhi_wuxing[month_zhi]}) 地支藏干：{self.hidden_stems[month_zhi]}
-日柱： {day_gan}({self.gan_wuxing[day_gan]})|{day_zhi}({self.zhi_wuxing[day_zhi]}) 地支藏干：{self.hidden_stems[day_zhi]}
-时柱： {hour_gan}({self.gan_wuxing[hour_gan]})|{hour_zhi}({self.zhi_wuxing[hour_zhi]}) 地支藏干：{self.hidden_stems[hour_zhi]}
+{pillar_lines}
 
 3. 命局关系分析
 五行统计: {wuxing_count} (显式, 不包括地支藏干以及合化五行)
@@ -456,13 +650,8 @@ class BaZiAutomation:
 
 4. 大运
 {da_yun_sequence}
-
-5. 当前时间（以运行时系统时间为准）
-当前公历时间: {runtime["current_solar_str"]}
-当前流年(年柱干支): {runtime["liu_nian_ganzhi"]}
-流年五行: 天干{runtime["liu_nian_gan"]}[{runtime["liu_nian_gan_wuxing"]}] / 地支{runtime["liu_nian_zhi"]}[{runtime["liu_nian_zhi_wuxing"]}]
 """.strip(
-            "\n"
-        )
+        "\n"
+    )
 
-        return prompt
+    return prompt
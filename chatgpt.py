@@ -1,5 +1,22 @@
-from typing import List, Any, Optional
-from openai import OpenAI
+import asyncio
+import functools
+from typing import AsyncIterator, List, Any, Dict, Optional
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from http_limits import HTTP_LIMITS
+
+
+@functools.lru_cache(maxsize=4)
+def _openai_client(api_key: str) -> OpenAI:
+    # One client (and httpx connection pool) per key, shared by every interface instance
+    return OpenAI(api_key=api_key, http_client=DefaultHttpxClient(limits=HTTP_LIMITS))
+
+
+@functools.lru_cache(maxsize=4)
+def _openai_async_client(api_key: str, loop: asyncio.AbstractEventLoop) -> AsyncOpenAI:
+    # One async client per key and event loop (async connections are bound to the loop that opened them)
+    return AsyncOpenAI(api_key=api_key, http_client=DefaultAsyncHttpxClient(limits=HTTP_LIMITS))
 
 
 class ChatGPTInterface:
@@ -10,7 +27,8 @@ class ChatGPTInterface:
         temperature: float = 0.0,
         max_tokens: int = 2048
     ):
-        self._client = OpenAI(api_key=api_key)
+        self._api_key = api_key
+        self._client = _openai_client(api_key)
         self._model_name = model_name
         self._generation_config = {
             "temperature": temperature,
@@ -21,14 +39,12 @@ class ChatGPTInterface:
     def reset(self):
         self._last_response_id = None
 
-    def ask(self,
-            prompt_elements: List[Any],
-            use_web_search: bool = True) -> str:
-        if len(prompt_elements) == 1 and isinstance(prompt_elements[0], (dict, list)):
+    def _build_request(self, prompt_elements: List[Any], use_web_search: bool) -> Dict[str, Any]:
+        if len(prompt_elements) == 1 and isinstance(prompt_elements[0], (dict, list, str)):
+            # Structured input goes through as-is; a single string needs no join
             api_input = prompt_elements[0]
         else:
-            text_parts = [str(p) for p in prompt_elements]
-            api_input = " ".join(text_parts)
+            api_input = " ".join(map(str, prompt_elements))
 
         kwargs = dict(
             model=self._model_name,
@@ -44,21 +60,50 @@ class ChatGPTInterface:
         if self._last_response_id is not None:
             kwargs["previous_response_id"] = self._last_response_id
 
-        response = self._client.responses.create(**kwargs)
+        return kwargs
 
+    def _handle_response(self, response: Any) -> str:
         self._last_response_id = getattr(response, "id", None)
 
         output_text = getattr(response, "output_text", None)
         if output_text:
             return output_text
 
-        if getattr(response, "output", None):
-            first_msg = response.output[0]
-            content = getattr(first_msg, "content", None)
-            if content and len(content) > 0:
-                first_block = content[0]
-                text = getattr(first_block, "text", None)
-                if text is not None:
-                    return text
+        # Fallback: text of the first content block of the first output item
+        try:
+            text = response.output[0].content[0].text
+        except (AttributeError, IndexError, TypeError):
+            text = None
+        if text is not None:
+            return text
 
         return str(response)
+
+    def ask(self,
+            prompt_elements: List[Any],
+            use_web_search: bool = True) -> str:
+        response = self._client.responses.create(**self._build_request(prompt_elements, use_web_search))
+        return self._handle_response(response)
+
+    def _async_client(self) -> AsyncOpenAI:
+        return _openai_async_client(self._api_key, asyncio.get_running_loop())
+
+    async def ask_async(self,
+                        prompt_elements: List[Any],
+                        use_web_search: bool = True) -> str:
+        response = await self._async_client().responses.create(**self._build_request(prompt_elements, use_web_search))
+        return self._handle_response(response)
+
+    async def ask_stream_async(self,
+                               prompt_elements: List[Any],
+                               use_web_search: bool = True) -> AsyncIterator[str]:
+        # Same request as ask_async, but yields output text deltas as they arrive
+        stream = await self._async_client().responses.create(
+            stream=True, **self._build_request(prompt_elements, use_web_search)
+        )
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                yield event.delta
+            elif event.type in ("response.completed", "response.incomplete", "response.failed"):
+                # Chain from whichever response this turn ended with, as ask() does for any status
+                self._last_response_id = getattr(event.response, "id", None)
@@ -1,8 +1,17 @@
 from __future__ import annotations
 
+import functools
 from typing import Any, Dict, List, Optional
 
-from anthropic import Anthropic
+from anthropic import Anthropic, DefaultHttpxClient
+
+from http_limits import HTTP_LIMITS
+
+
+@functools.lru_cache(maxsize=4)
+def _anthropic_client(api_key: str) -> Anthropic:
+    """Return a shared Anthropic client per API key so instances reuse one keep-alive connection pool."""
+    return Anthropic(api_key=api_key, http_client=DefaultHttpxClient(limits=HTTP_LIMITS))
 
 
 class ClaudeInterface:
@@ -35,7 +44,7 @@ class ClaudeInterface:
             enable_web_search_tool: If True, configures a managed web search tool descriptor.
             web_search_tool_type: Tool type string for the managed web search tool (versioned by Anthropic).
         """
-        self._client = Anthropic(api_key=api_key)
+        self._client = _anthropic_client(api_key)
         self._model_name = model_name
         self._temperature = float(temperature)
         self._max_tokens = int(max_tokens)
@@ -63,9 +72,11 @@ class ClaudeInterface:
         If a single structured object (dict/list) is provided, it is stringified.
         Otherwise, elements are stringified and concatenated with spaces.
         """
-        if len(prompt_elements) == 1 and isinstance(prompt_elements[0], (dict, list)):
-            return str(prompt_elements[0])
-        return " ".join(str(p) for p in prompt_elements)
+        if len(prompt_elements) == 1:
+            # Common case: a single prompt string needs no join (dict/list elements are stringified)
+            element = prompt_elements[0]
+            return element if isinstance(element, str) else str(element)
+        return " ".join(map(str, prompt_elements))
 
     @staticmethod
     def _extract_text(resp: Any) -> str:
@@ -75,14 +86,9 @@ class ClaudeInterface:
         Returns:
             Concatenated text if present, otherwise an empty string.
         """
-        text_chunks: List[str] = []
         content = getattr(resp, "content", None) or []
-        for block in content:
-            if getattr(block, "type", None) == "text":
-                text_val = getattr(block, "text", None)
-                if text_val:
-                    text_chunks.append(text_val)
-        return "".join(text_chunks)
+        # Only text blocks are guaranteed to carry .text; "" chunks are harmless in the join
+        return "".join([block.text for block in content if block.type == "text"])
 
     def ask(self, prompt_elements: List[Any], use_web_search: bool = True) -> str:
         """
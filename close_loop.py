@@ -2,10 +2,25 @@ from __future__ import annotations
 
 import argparse
 import ast
+import asyncio
+import functools
+import hashlib
+import json
 import os
-from concurrent.futures import ThreadPoolExecutor
+import re
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:  # optional: the stdlib scanner is slower but accepts the same documents
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
 
 from gemini import GeminiInterface
 from chatgpt import ChatGPTInterface
@@ -21,6 +36,10 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 CHATGPT_API_KEY = os.getenv("CHATGPT_API_KEY")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 
+# Per-call limit (seconds) for one model's reply in a debate round; <= 0 disables it.
+# The initial answers and the long final answers are not limited by it.
+ROUND_TIMEOUT = float(os.getenv("DEBATE_ROUND_TIMEOUT_S", "120"))
+
 
 # =============================================================================
 # Model initialization
@@ -59,10 +78,26 @@ deepseek = DeepSeekInterface(
 # =============================================================================
 # Prompt loading / utilities
 # =============================================================================
+_LANG_HINTS: Dict[str, str] = {
+    "zh": "Please answer the following in Simplified Chinese:\n",
+    "en": "Please answer the following in English:\n",
+}
+
+
+@functools.lru_cache(maxsize=32)
+def _read_prompt_cached(path: str, mtime_ns: int) -> str:
+    """Read and strip a prompt file; keyed on mtime so an edited file is re-read."""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
 def load_prompt(prefix: Optional[str] = None, output_lang: str = "zh") -> List[str]:
     """
     Load the user prompt from disk and optionally enforce the output language.
 
+    The file contents are cached per (path, mtime), so repeated calls in a long-running process
+    only hit the disk again after the file changes.
+
     Args:
         prefix: If provided, load `prompt_{prefix}.md`. Otherwise load `prompt.md`.
         output_lang: "zh" for Simplified Chinese, "en" for English.
@@ -72,26 +107,110 @@ def load_prompt(prefix: Optional[str] = None, output_lang: str = "zh") -> List[s
     """
     prompt_file = f"prompt_{prefix}.md" if prefix else "prompt.md"
 
-    with open(prompt_file, "r", encoding="utf-8") as f:
-        prompt_str = f.read().strip()
+    prompt_str = _read_prompt_cached(prompt_file, os.stat(prompt_file).st_mtime_ns)
 
-    if output_lang == "zh":
-        lang_hint = "Please answer the following in Simplified Chinese:\n"
-    elif output_lang == "en":
-        lang_hint = "Please answer the following in English:\n"
-    else:
+    lang_hint = _LANG_HINTS.get(output_lang)
+    if lang_hint is None:
         raise ValueError("output_lang must be 'zh' or 'en'")
 
     return [lang_hint + prompt_str]
 
 
+# Head of a `[True, '...` / `[False, "...` reply, up to and including the opening quote
+_LIST_HEAD_RE = re.compile(r"""\s*\[\s*(True|False)\s*,\s*(['"])""")
+# What may follow the closing quote: an optional trailing comma and the closing bracket
+_LIST_TAIL_RE = re.compile(r"\s*,?\s*\]\s*")
+
+
+def _parse_list_fast(text: str) -> Optional[List[Any]]:
+    """
+    Parse `[<bool>, '<str>']` with one regex match and a quote scan instead of a full AST walk.
+
+    Returns None whenever the input is not exactly that shape (or uses a string form this scanner
+    leaves alone: empty/triple-quoted strings, raw newlines), so the caller falls back to
+    ast.literal_eval with unchanged results.
+    """
+    head = _LIST_HEAD_RE.match(text)
+    if head is None:
+        return None
+
+    quote = head.group(2)
+    start = head.end()
+    if text.startswith(quote, start):
+        return None
+
+    # The closing quote is the first one preceded by an even number of backslashes
+    pos = start
+    while True:
+        end = text.find(quote, pos)
+        if end == -1:
+            return None
+        k = end
+        while text[k - 1] == "\\":
+            k -= 1
+        if (end - k) % 2 == 0:
+            break
+        pos = end + 1
+
+    if _LIST_TAIL_RE.fullmatch(text, end + 1) is None:
+        return None
+
+    body = text[start:end]
+    if "\n" in body or "\r" in body:
+        return None
+    if "\\" in body:
+        # Only the string literal itself goes through the (much smaller) AST evaluation
+        try:
+            body = ast.literal_eval(text[start - 1:end + 1])
+        except Exception:
+            return None
+
+    return [head.group(1) == "True", body]
+
+
+# First fenced code block; an info string on the opening line (```python, ```json) is not content
+_FENCE_RE = re.compile(r"```(?:\w*\n)?(.*?)```", re.DOTALL)
+
+# Head of a JSON-style `[true, "...` reply (or the Python spelling of the flag)
+_JSON_HEAD_RE = re.compile(r"\s*\[\s*(true|false|True|False)\s*,")
+
+
+def _parse_list_json(text: str) -> Optional[List[Any]]:
+    """
+    Parse `[<bool>, "<str>"]` as JSON (orjson when installed, else the stdlib json module),
+    accepting `true`/`false` as well as `True`/`False`.
+
+    Only the flag token is normalized; the message is never rewritten. Python-spelled replies with
+    backslash escapes are left to ast.literal_eval, whose escape rules differ from JSON's (e.g. `\\/`).
+    Returns None when the input is not exactly that shape.
+    """
+    head = _JSON_HEAD_RE.match(text)
+    if head is None:
+        return None
+
+    flag = head.group(1)
+    if flag[0] in "TF":
+        if "\\" in text:
+            return None
+        text = text[:head.start(1)] + flag.lower() + text[head.end(1):]
+
+    try:
+        data = _json_loads(text)
+    except ValueError:
+        return None
+    if isinstance(data, list) and len(data) == 2 and isinstance(data[0], bool) and isinstance(data[1], str):
+        return data
+    return None
+
+
 def parse_list_response(text: str) -> List[Any]:
     """
     Parse a model response in the required format: a Python list [bool, str].
 
     Strategy:
-      1) Try ast.literal_eval directly.
-      2) If that fails, strip a single code fence block and try again.
+      1) Try the regex/quote-scan fast path, the JSON path (also accepts JSON `true`/`false`),
+         then ast.literal_eval directly.
+      2) If that fails, take the first code fence block (minus its language tag) and try all three again.
       3) If still fails, fall back to a simple heuristic:
          - If 'true' appears (and not 'false') in the first 200 chars -> True
          - Else -> False
@@ -100,6 +219,12 @@ def parse_list_response(text: str) -> List[Any]:
     Returns:
         [agree: bool, answer: str]
     """
+    data = _parse_list_fast(text)
+    if data is None:
+        data = _parse_list_json(text)
+    if data is not None:
+        return data
+
     try:
         data = ast.literal_eval(text)
         if (
@@ -113,10 +238,15 @@ def parse_list_response(text: str) -> List[Any]:
         pass
 
     cleaned = text.strip()
-    if "```" in cleaned:
-        parts = cleaned.split("```")
-        if len(parts) >= 3:
-            cleaned = parts[1].strip()
+    fence = _FENCE_RE.search(cleaned)
+    if fence is not None:
+        cleaned = fence.group(1).strip()
+
+    data = _parse_list_fast(cleaned)
+    if data is None:
+        data = _parse_list_json(cleaned)
+    if data is not None:
+        return data
 
     try:
         data = ast.literal_eval(cleaned)
@@ -130,26 +260,184 @@ def parse_list_response(text: str) -> List[Any]:
     except Exception:
         pass
 
+    # True only when "true" appears and "false" does not; everything else (incl. neither) is False
     head = cleaned[:200].lower()
-    if "true" in head and "false" not in head:
-        agree = True
-    elif "false" in head and "true" not in head:
-        agree = False
-    else:
-        agree = False
+    agree = head.find("true") != -1 and head.find("false") == -1
 
     return [agree, text]
 
 
-def write_log_to_file(log_lines: List[str], filename: str) -> None:
-    """Write a Markdown log file to disk."""
-    dir_path = os.path.dirname(filename)
-    if dir_path:
-        os.makedirs(dir_path, exist_ok=True)
+def _write_bytes(filename: str, data: bytes) -> None:
+    """Create/truncate a file and write data with raw os.write calls (no Python-level buffering)."""
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+# A debate log entry: (kind, *fields). Entries hold the raw payloads and are only rendered to
+# Markdown by _render_log when the log is flushed; the last field is always the datetime of the event.
+LogEntry = Tuple[Any, ...]
+
+
+def _fmt_prompt(entry: LogEntry) -> str:
+    _, prompt_text, ts = entry
+    return f"=== Initial User Prompt ===\n{prompt_text}\n(timestamp: {ts.isoformat()})"
+
+
+def _fmt_initial_answer(entry: LogEntry) -> str:
+    _, name, raw, ts = entry
+    return f"=== Initial {name} Answer ===\n{raw}\n(timestamp: {ts.isoformat()})"
+
+
+def _fmt_initial_error(entry: LogEntry) -> str:
+    _, name, error, ts = entry
+    return (
+        f"=== Initial {name} Error ===\n"
+        f"Error: {error}\n"
+        "This model failed to return in the initial round; it will be retried in later rounds.\n"
+        f"(timestamp: {ts.isoformat()})"
+    )
+
+
+def _fmt_not_enough(entry: LogEntry) -> str:
+    _, loop_idx, n, ts = entry
+    return (
+        f"=== Loop {loop_idx}: Not enough participants (n={n}). Stopping. ===\n"
+        f"(timestamp: {ts.isoformat()})"
+    )
+
+
+def _fmt_evaluation(entry: LogEntry) -> str:
+    _, loop_idx, name, prompt, raw, agree, answer_len, ts = entry
+    return (
+        f"=== Loop {loop_idx}: {name} Evaluation ===\n"
+        f"Prompt to {name}:\n{prompt}\n\n"
+        f"Raw output:\n{raw}\n\n"
+        f"Parsed -> agree: {agree}, answer length: {answer_len}\n"
+        f"(timestamp: {ts.isoformat()})"
+    )
+
+
+def _fmt_loop_error(entry: LogEntry) -> str:
+    _, loop_idx, name, prompt, error, ts = entry
+    return (
+        f"=== Loop {loop_idx}: {name} Error ===\n"
+        f"Prompt to {name}:\n{prompt}\n\n"
+        f"Error: {error}\n"
+        "This model is considered offline for this round, but will be retried next round.\n"
+        f"(timestamp: {ts.isoformat()})"
+    )
+
+
+def _fmt_skipped(entry: LogEntry) -> str:
+    _, loop_idx, name, ts = entry
+    return f"=== Loop {loop_idx}: {name} Skipped (agreed, peers unchanged) ===\n(timestamp: {ts.isoformat()})"
+
+
+def _fmt_agreement(entry: LogEntry) -> str:
+    _, rows, ts = entry
+    return (
+        "=== Final Agreement (All successful models True) ===\n"
+        + "\n".join([f"{name} agree={agree} answer_len={answer_len}" for name, agree, answer_len in rows])
+        + f"\n(timestamp: {ts.isoformat()})"
+    )
+
+
+def _fmt_majority(entry: LogEntry) -> str:
+    _, loop_idx, min_agree_ratio, rows, ts = entry
+    agreers = sum(1 for _, agree, _ in rows if agree)
+    return (
+        f"=== Loop {loop_idx}: Majority Agreement ({agreers}/{len(rows)} agree, dissent unchanged, "
+        f"min_agree_ratio={min_agree_ratio:g}) ===\n"
+        + "\n".join([f"{name} agree={agree} answer_len={answer_len}" for name, agree, answer_len in rows])
+        + f"\n(timestamp: {ts.isoformat()})"
+    )
+
+
+def _fmt_final_answer(entry: LogEntry) -> str:
+    _, name, answer, ts = entry
+    return f"=== Final Long Answer from {name} ===\n{answer}\n(timestamp: {ts.isoformat()})"
+
 
-    with open(filename, "w", encoding="utf-8") as f:
-        for entry in log_lines:
-            f.write(entry.rstrip() + "\n\n")
+def _fmt_final_error(entry: LogEntry) -> str:
+    _, name, error, ts = entry
+    return f"=== Final Long Answer Error from {name} ===\nError: {error}\n(timestamp: {ts.isoformat()})"
+
+
+def _fmt_final_skipped(entry: LogEntry) -> str:
+    _, name, ts = entry
+    return (
+        f"=== Final Long Answer Skipped for {name} ===\n"
+        "This model failed its last call; its latest answer (if any) is used instead.\n"
+        f"(timestamp: {ts.isoformat()})"
+    )
+
+
+def _fmt_summary(entry: LogEntry) -> str:
+    _, rows, ts = entry
+    return (
+        "=== Final Summary ===\n"
+        + "\n".join(
+            [f"{name} temporarily_down={down} has_last_answer={has_answer}" for name, down, has_answer in rows]
+        )
+        + f"\n(timestamp: {ts.isoformat()})"
+    )
+
+
+_LOG_FORMATTERS: Dict[str, Callable[[LogEntry], str]] = {
+    "prompt": _fmt_prompt,
+    "initial_answer": _fmt_initial_answer,
+    "initial_error": _fmt_initial_error,
+    "not_enough": _fmt_not_enough,
+    "evaluation": _fmt_evaluation,
+    "loop_error": _fmt_loop_error,
+    "skipped": _fmt_skipped,
+    "agreement": _fmt_agreement,
+    "majority": _fmt_majority,
+    "final_answer": _fmt_final_answer,
+    "final_error": _fmt_final_error,
+    "final_skipped": _fmt_final_skipped,
+    "summary": _fmt_summary,
+}
+
+
+# Field names of each LogEntry kind (everything between the kind and the timestamp), for JSONL output
+_LOG_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "prompt": ("prompt",),
+    "initial_answer": ("model", "raw"),
+    "initial_error": ("model", "error"),
+    "not_enough": ("loop", "participants"),
+    "evaluation": ("loop", "model", "prompt", "raw", "agree", "answer_len"),
+    "loop_error": ("loop", "model", "prompt", "error"),
+    "skipped": ("loop", "model"),
+    "agreement": ("models",),
+    "majority": ("loop", "min_agree_ratio", "models"),
+    "final_answer": ("model", "answer"),
+    "final_error": ("model", "error"),
+    "final_skipped": ("model",),
+    "summary": ("models",),
+}
+
+
+def _render_log_jsonl(log_lines: List[LogEntry]) -> bytes:
+    """Serialize log entries as JSON Lines: {"t": <iso timestamp>, "kind": ..., <fields>...}."""
+    out = []
+    for entry in log_lines:
+        kind = entry[0]
+        record = {"t": entry[-1].isoformat(), "kind": kind}
+        record.update(zip(_LOG_FIELDS[kind], entry[1:-1]))
+        out.append(_json_dumps(record))
+        out.append(b"\n")
+    return b"".join(out)
+
+
+def _render_log(log_lines: List[LogEntry]) -> str:
+    """Render LogEntry tuples to Markdown blocks."""
+    return "".join([_LOG_FORMATTERS[entry[0]](entry).rstrip() + "\n\n" for entry in log_lines])
 
 
 def write_final_answers_to_file(
@@ -157,21 +445,20 @@ def write_final_answers_to_file(
     filename: str,
     output_lang: str,
 ) -> None:
-    """Write each model's final answer to a Markdown file."""
-    dir_path = os.path.dirname(filename)
-    if dir_path:
-        os.makedirs(dir_path, exist_ok=True)
+    """
+    Write each model's final answer to a Markdown file (built in memory, then written in one go).
 
+    The target directory must already exist (close_loop_ask creates it up front).
+    """
     title = (
         "# Final Answers (Re-answered Original Prompt)\n"
         if output_lang == "en"
         else "# 最终答案（重新回答原始问题）\n"
     )
 
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(title)
-        for model_name, ans in final_answers.items():
-            f.write(f"## {model_name}\n{ans}\n\n")
+    parts = [title]
+    parts.extend([f"## {model_name}\n{ans}\n\n" for model_name, ans in final_answers.items()])
+    _write_bytes(filename, "".join(parts).encode("utf-8"))
 
 
 # =============================================================================
@@ -180,41 +467,212 @@ def write_final_answers_to_file(
 ModelState = Dict[str, Any]
 
 
+# Invariant debate prompt text: only the peer answers change between rounds
+_WEB_HEADER_IDS = frozenset({"gemini", "chatgpt", "claude"})
+
+_DEBATE_HEADER_WEB = (
+    "You are participating in a multi-model debate on the same user question.\n"
+    "You have access to web search tools in this environment.\n"
+    "If other models request a fact check or up-to-date info, you may search and bring back evidence.\n\n"
+)
+_DEBATE_HEADER_NO_WEB = (
+    "You are participating in a multi-model debate on the same user question.\n"
+    "You do NOT have direct web search access in this environment.\n"
+    "If you need up-to-date facts, explicitly ask the web-enabled models to verify specific claims.\n\n"
+)
+_DEBATE_META_HEAD = (
+    "You will see other models' latest outputs below.\n"
+    "------------------------------\n"
+)
+_DEBATE_META_TASKS = (
+    "\n"
+    "Your tasks:\n"
+    "1) Critically judge whether you agree with the other models' key conclusions and reasoning.\n"
+    "2) Group viewpoints: which model aligns with you, and which is incorrect or missing key points?\n"
+    "3) If you change your mind, explicitly state what convinced you and how your stance updated.\n"
+    "4) Focus on convergence:\n"
+    "   - Identify established consensus.\n"
+    "   - For disagreements, strengthen arguments or propose a resolution path.\n"
+    "   - Avoid rewriting a full final answer; prioritize deltas, corrections, and persuasion.\n"
+    "5) Write directly to the other models: debate, challenge, reconcile.\n"
+)
+_DEBATE_WEB_PART = (
+    "\nWeb search guidance:\n"
+    "  - If you can search, do so when factual accuracy or recency matters.\n"
+    "  - If you use web search, include a short 'References:' list with key URLs.\n"
+    "  - If you do not use web search, write 'References: none'.\n"
+)
+_DEBATE_NO_WEB_PART = (
+    "\nWeb search guidance:\n"
+    "  - You cannot browse the web directly.\n"
+    "  - You may cite links surfaced by other models; label them as 'via <model name>'.\n"
+)
+_DEBATE_TAIL = (
+    "\nOutput format (strict):\n"
+    "  - Return a Python list of length 2:\n"
+    "    [<agree_bool>, <message_str>]\n"
+    "  - agree_bool = True only if you believe all successful models have converged on key conclusions.\n"
+    "  - message_str must be English and should be addressed to other models.\n"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _debate_prompt_frame(mid: str, supports_web: bool) -> Tuple[str, str]:
+    """Return the (before, after) text around the peer answers in a model's debate prompt."""
+    header = _DEBATE_HEADER_WEB if mid in _WEB_HEADER_IDS else _DEBATE_HEADER_NO_WEB
+    web_part = _DEBATE_WEB_PART if supports_web else _DEBATE_NO_WEB_PART
+    return header + _DEBATE_META_HEAD, _DEBATE_META_TASKS + web_part + _DEBATE_TAIL
+
+
+@functools.lru_cache(maxsize=None)
+def _final_prompt(name: str, supports_web: bool, output_lang: str) -> str:
+    """
+    Build the final long-form answer prompt for one model (cached; it depends only on the arguments).
+    The final answer language is controlled by output_lang.
+    """
+    lang_line = (
+        "Write the final answer in Simplified Chinese."
+        if output_lang == "zh"
+        else "Write the final answer in English."
+    )
+
+    head = (
+        "All online models have substantially converged on the question.\n"
+        f"You are {name}. Now write a final long-form answer for the user.\n"
+        "The user does not care about the debate process. Produce a standalone, polished report.\n\n"
+    )
+
+    body = (
+        f"Language requirement: {lang_line}\n\n"
+        "Writing requirements:\n"
+        "1) Do NOT mention models, debate, rounds, or 'another model said...'.\n"
+        "2) Start with a concise overview (1–3 paragraphs) of key conclusions.\n"
+        "3) Expand in sections with clear reasoning and concrete examples.\n"
+        "4) Include uncertainty, limitations, and common misinterpretations.\n"
+        "5) End with a practical summary and actionable suggestions.\n"
+        "6) Length: be thorough. If the topic benefits from detail, write a long answer.\n"
+        "7) If you used web search or relied on external links earlier, integrate them naturally\n"
+        "   and add a 'References:' section with key URLs. Otherwise write 'References: none'.\n\n"
+        "Now output the full final answer.\n"
+    )
+
+    if not supports_web:
+        extra = (
+            "Note: You cannot browse the web directly. You may include references previously surfaced\n"
+            "by web-enabled participants; label them as 'via <model name>: <url>'.\n\n"
+        )
+        return head + extra + body
+
+    return head + body
+
+
+async def _ask_model(m: ModelState, prompt_elements: List[str]) -> str:
+    """
+    Ask one model and return its full reply text.
+
+    Interfaces without ask_async run their blocking ask() in a worker thread.
+    """
+    iface = m["interface"]
+    args = (prompt_elements, True) if m["supports_web"] else (prompt_elements,)
+
+    ask_async = getattr(iface, "ask_async", None)
+    if ask_async is None:
+        return await asyncio.to_thread(iface.ask, *args)
+    return await ask_async(*args)
+
+
+async def _ask_model_timed(
+    m: ModelState,
+    prompt_elements: List[str],
+    timeout: Optional[float],
+) -> str:
+    """_ask_model bounded by `timeout` seconds (None = no limit); a late reply is cancelled."""
+    try:
+        return await asyncio.wait_for(_ask_model(m, prompt_elements), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"{m['name']} did not reply within {timeout:g} s") from None
+
+
+async def _ask_all(
+    targets: List[ModelState],
+    prompts: Dict[str, List[str]],
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Query several models concurrently (one request each, overlapped on one event loop).
+
+    A model that does not answer within `timeout` seconds gets a TimeoutError as its result,
+    so one hung vendor cannot stall the whole round.
+
+    Returns:
+        {model id: reply text, or the exception raised by that model's call}
+    """
+    results = await asyncio.gather(
+        *(_ask_model_timed(m, prompts[m["id"]], timeout) for m in targets),
+        return_exceptions=True,
+    )
+    return {m["id"]: res for m, res in zip(targets, results)}
+
+
 def close_loop_ask(
     prompt: List[str],
     max_loops: int = 20,
     log_filename: str = "logs/default/dialog_log.md",
     final_answers_filename: str = "logs/default/final_answers.md",
     output_lang: str = "zh",
+    round_timeout: float = ROUND_TIMEOUT,
+    min_agree_ratio: float = 1.0,
+    log_jsonl_filename: Optional[str] = None,
 ) -> Tuple[str, str, str, str, str, str]:
     """
     Run a multi-model debate loop until consensus is reached (or max_loops is hit).
 
     Consensus criterion:
       - Among models that successfully return in a round, all output agree=True.
+      - Or, with min_agree_ratio < 1: at least that fraction of them agree and every dissenting
+        model returned the same answer as in the previous round (the dissent has stopped moving).
 
     Args:
         prompt: The initial user prompt (list of one string).
         max_loops: Maximum debate rounds after the initial round.
         log_filename: Where to write the full dialogue log (Markdown).
+        log_jsonl_filename: If set, also write the log there as JSON Lines (one object per entry).
         final_answers_filename: Where to write final long answers (Markdown).
         output_lang: Final output language ("zh" or "en"). Debate prompts are always English.
+        round_timeout: Seconds each model gets per debate round before it is treated as failed for
+            that round (<= 0 disables the limit). The initial and final rounds are not limited: they
+            ask for full-length answers that routinely take longer than a debate reply.
+        min_agree_ratio: Fraction of successful models that must agree for an early exit while the
+            remaining dissent is unchanged; 1.0 (default) requires unanimous agreement.
 
     Returns:
         (gemini_final, chatgpt_final, deepseek_final,
          last_gemini_struct, last_chatgpt_struct, last_deepseek_struct)
     """
 
-    def get_model(models: List[ModelState], mid: str) -> Optional[ModelState]:
-        for m in models:
-            if m["id"] == mid:
-                return m
-        return None
-
-    def build_debate_prompt(target_model: ModelState, participants: List[ModelState]) -> str:
+    def record_answer(m: ModelState, answer: str) -> None:
+        """Store a model's latest answer, bumping its version only when the text actually changed."""
+        digest = hashlib.blake2b(answer.encode("utf-8"), digest_size=8).digest()
+        if digest != m["answer_digest"]:
+            m["answer_digest"] = digest
+            m["version"] += 1
+        m["last_answer"] = answer
+
+    def build_debate_prompt(
+        target_model: ModelState,
+        participants: List[ModelState],
+        peer_blocks: Dict[Tuple[str, bool], str],
+        seen: Dict[str, int],
+    ) -> str:
         """
         Build the per-round debate prompt for a specific model.
 
+        Only the peer answers change between rounds; the surrounding text comes from _debate_prompt_frame.
+        Each model keeps its own conversation history, so a peer answer the target has already been
+        sent (same version) is replaced by a one-line recap. The versions embedded here are recorded
+        in `seen`; the caller commits them to target_model["sent_versions"] once the call succeeds.
+        `peer_blocks` is shared by all targets of a round, so each peer block is rendered only once.
+
         Output format requirement:
           - Must return a Python list of length 2: [bool, str]
           - bool indicates whether the successful models have converged on key conclusions.
@@ -224,116 +682,69 @@ def close_loop_ask(
 
         others = [m for m in participants if m["id"] != mid]
         if others:
+            sent_versions = target_model["sent_versions"]
             other_desc_lines = []
             for m in others:
-                other_desc_lines.append(
-                    f"[{m['name']} - Latest Answer]\n{m['last_answer']}\n"
-                    "------------------------------\n"
-                )
+                unchanged = sent_versions.get(m["id"]) == m["version"]
+                if not unchanged:
+                    seen[m["id"]] = m["version"]
+                key = (m["id"], unchanged)
+                block = peer_blocks.get(key)
+                if block is None:
+                    body = "(Unchanged since the last time it was shown to you.)" if unchanged else m["last_answer"]
+                    block = peer_blocks[key] = (
+                        f"[{m['name']} - Latest Answer]\n{body}\n"
+                        "------------------------------\n"
+                    )
+                other_desc_lines.append(block)
             others_block = "".join(other_desc_lines)
         else:
             others_block = "(Only you returned a valid answer in the previous round.)\n"
 
-        if mid in ("gemini", "chatgpt", "claude"):
-            header = (
-                "You are participating in a multi-model debate on the same user question.\n"
-                "You have access to web search tools in this environment.\n"
-                "If other models request a fact check or up-to-date info, you may search and bring back evidence.\n\n"
-            )
-        else:
-            header = (
-                "You are participating in a multi-model debate on the same user question.\n"
-                "You do NOT have direct web search access in this environment.\n"
-                "If you need up-to-date facts, explicitly ask the web-enabled models to verify specific claims.\n\n"
-            )
-
-        meta = (
-            "You will see other models' latest outputs below.\n"
-            "------------------------------\n"
-            f"{others_block}\n"
-            "Your tasks:\n"
-            "1) Critically judge whether you agree with the other models' key conclusions and reasoning.\n"
-            "2) Group viewpoints: which model aligns with you, and which is incorrect or missing key points?\n"
-            "3) If you change your mind, explicitly state what convinced you and how your stance updated.\n"
-            "4) Focus on convergence:\n"
-            "   - Identify established consensus.\n"
-            "   - For disagreements, strengthen arguments or propose a resolution path.\n"
-            "   - Avoid rewriting a full final answer; prioritize deltas, corrections, and persuasion.\n"
-            "5) Write directly to the other models: debate, challenge, reconcile.\n"
-        )
-
-        web_part = (
-            "\nWeb search guidance:\n"
-            "  - If you can search, do so when factual accuracy or recency matters.\n"
-            "  - If you use web search, include a short 'References:' list with key URLs.\n"
-            "  - If you do not use web search, write 'References: none'.\n"
-            if target_model["supports_web"]
-            else
-            "\nWeb search guidance:\n"
-            "  - You cannot browse the web directly.\n"
-            "  - You may cite links surfaced by other models; label them as 'via <model name>'.\n"
-        )
-
-        tail = (
-            "\nOutput format (strict):\n"
-            "  - Return a Python list of length 2:\n"
-            "    [<agree_bool>, <message_str>]\n"
-            "  - agree_bool = True only if you believe all successful models have converged on key conclusions.\n"
-            "  - message_str must be English and should be addressed to other models.\n"
-        )
-
-        return header + meta + web_part + tail
+        before, after = _debate_prompt_frame(mid, target_model["supports_web"])
+        return before + others_block + after
 
     def build_final_prompt(target_model: ModelState) -> str:
-        """
-        Build the final long-form answer prompt for one model.
-        The final answer language is controlled by output_lang.
-        """
-        lang_line = (
-            "Write the final answer in Simplified Chinese."
-            if output_lang == "zh"
-            else "Write the final answer in English."
-        )
-
-        head = (
-            "All online models have substantially converged on the question.\n"
-            f"You are {target_model['name']}. Now write a final long-form answer for the user.\n"
-            "The user does not care about the debate process. Produce a standalone, polished report.\n\n"
-        )
-
-        body = (
-            f"Language requirement: {lang_line}\n\n"
-            "Writing requirements:\n"
-            "1) Do NOT mention models, debate, rounds, or 'another model said...'.\n"
-            "2) Start with a concise overview (1–3 paragraphs) of key conclusions.\n"
-            "3) Expand in sections with clear reasoning and concrete examples.\n"
-            "4) Include uncertainty, limitations, and common misinterpretations.\n"
-            "5) End with a practical summary and actionable suggestions.\n"
-            "6) Length: be thorough. If the topic benefits from detail, write a long answer.\n"
-            "7) If you used web search or relied on external links earlier, integrate them naturally\n"
-            "   and add a 'References:' section with key URLs. Otherwise write 'References: none'.\n\n"
-            "Now output the full final answer.\n"
-        )
-
-        if not target_model["supports_web"]:
-            extra = (
-                "Note: You cannot browse the web directly. You may include references previously surfaced\n"
-                "by web-enabled participants; label them as 'via <model name>: <url>'.\n\n"
-            )
-            return head + extra + body
-
-        return head + body
+        """Final long-form answer prompt for one model, in output_lang."""
+        return _final_prompt(target_model["name"], target_model["supports_web"], output_lang)
 
     # =========================
     # Start
     # =========================
-    log: List[str] = []
-    prompt_text = " ".join(str(p) for p in prompt)
-    log.append(
-        "=== Initial User Prompt ===\n"
-        f"{prompt_text}\n"
-        f"(timestamp: {datetime.now().isoformat()})"
-    )
+    assert all(isinstance(p, str) for p in prompt), "prompt elements must be str"
+
+    _now = datetime.now
+    # The log is written round by round: entries collect in `log` and flush_log() renders and
+    # appends them at each round boundary, so memory stays bounded and a crash keeps earlier rounds.
+    # Create every output directory once, up front (usually all three files share one)
+    for out_dir in {os.path.dirname(fn) for fn in (log_filename, final_answers_filename, log_jsonl_filename) if fn}:
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+    log: List[LogEntry] = []
+    # Opened right before the run, inside the try that closes them (see below)
+    log_fh = None
+    jsonl_fh = None
+
+    def flush_log() -> None:
+        if log:
+            log_fh.write(_render_log(log))
+            if jsonl_fh is not None:
+                jsonl_fh.write(_render_log_jsonl(log))
+            log.clear()
+        log_fh.flush()
+        if jsonl_fh is not None:
+            jsonl_fh.flush()
+
+    def close_log() -> None:
+        if log_fh is None:
+            return
+        flush_log()
+        log_fh.close()
+        if jsonl_fh is not None:
+            jsonl_fh.close()
+
+    prompt_text = prompt[0] if len(prompt) == 1 else " ".join(prompt)
+    log.append(("prompt", prompt_text, _now()))
 
     models: List[ModelState] = [
         {
@@ -345,6 +756,11 @@ def close_loop_ask(
             "last_answer": "",
             "last_struct": "",
             "last_agree": False,
+            "version": 0,
+            "answer_digest": b"",
+            "sent_versions": {},
+            "last_peer_fp": None,
+            "history_compactions": 0,
         },
         {
             "id": "chatgpt",
@@ -355,6 +771,11 @@ def close_loop_ask(
             "last_answer": "",
             "last_struct": "",
             "last_agree": False,
+            "version": 0,
+            "answer_digest": b"",
+            "sent_versions": {},
+            "last_peer_fp": None,
+            "history_compactions": 0,
         },
         {
             "id": "deepseek",
@@ -365,6 +786,11 @@ def close_loop_ask(
             "last_answer": "",
             "last_struct": "",
             "last_agree": False,
+            "version": 0,
+            "answer_digest": b"",
+            "sent_versions": {},
+            "last_peer_fp": None,
+            "history_compactions": 0,
         },
         # {
         #     "id": "claude",
@@ -375,6 +801,11 @@ def close_loop_ask(
         #     "last_answer": "",
         #     "last_struct": "",
         #     "last_agree": False,
+        #     "version": 0,
+        #     "answer_digest": b"",
+        #     "sent_versions": {},
+        #     "last_peer_fp": None,
+        #     "history_compactions": 0,
         # },
         # {
         #     "id": "qwen",
@@ -385,155 +816,206 @@ def close_loop_ask(
         #     "last_answer": "",
         #     "last_struct": "",
         #     "last_agree": False,
+        #     "version": 0,
+        #     "answer_digest": b"",
+        #     "sent_versions": {},
+        #     "last_peer_fp": None,
+        #     "history_compactions": 0,
         # },
     ]
+    models_by_id: Dict[str, ModelState] = {m["id"]: m for m in models}
+    timeout = round_timeout if round_timeout > 0 else None
 
-    loop_idx = 0
+    async def run_debate() -> Dict[str, str]:
+        """Run the initial round, the debate loops and the final answers; each round fans out concurrently."""
+        loop_idx = 0
 
-    with ThreadPoolExecutor(max_workers=len(models)) as executor:
         # Initial round: each model answers the user prompt (parallel).
         print("=== Initial Round: All models answer the original prompt ===")
-        init_futs = {}
-
-        for m in models:
-            mid = m["id"]
-            if m["supports_web"]:
-                init_futs[mid] = executor.submit(m["interface"].ask, prompt, True)
-            else:
-                init_futs[mid] = executor.submit(m["interface"].ask, prompt)
+        init_results = await _ask_all(models, {m["id"]: prompt for m in models})
+        # One timestamp per round: every entry of a batch shares the moment its results came back
+        ts = _now()
 
         for m in models:
             mid = m["id"]
             try:
-                raw = init_futs[mid].result()
-                m["last_answer"] = raw
-                log.append(
-                    f"=== Initial {m['name']} Answer ===\n"
-                    f"{raw}\n"
-                    f"(timestamp: {datetime.now().isoformat()})"
-                )
+                raw = init_results[mid]
+                if isinstance(raw, BaseException):
+                    raise raw
+                record_answer(m, raw)
+                log.append(("initial_answer", m["name"], raw, ts))
             except Exception as e:
                 m["temporarily_down"] = True
-                m["last_answer"] = f"[{m['name']} initial call failed: {repr(e)}]"
-                log.append(
-                    f"=== Initial {m['name']} Error ===\n"
-                    f"Error: {repr(e)}\n"
-                    "This model failed to return in the initial round; it will be retried in later rounds.\n"
-                    f"(timestamp: {datetime.now().isoformat()})"
-                )
+                record_answer(m, f"[{m['name']} initial call failed: {repr(e)}]")
+                log.append(("initial_error", m["name"], repr(e), ts))
 
+        flush_log()
         print("=== Initial Round Complete. Starting Debate Loops ===")
 
         # Debate loops
         while loop_idx < max_loops:
+            flush_log()  # persist the previous round before starting the next
             loop_idx += 1
             print(f"\n=== Loop {loop_idx} ===")
 
             participants = [m for m in models if not m["temporarily_down"]]
 
             if len(participants) < 2:
-                log.append(
-                    f"=== Loop {loop_idx}: Not enough participants (n={len(participants)}). Stopping. ===\n"
-                    f"(timestamp: {datetime.now().isoformat()})"
-                )
+                log.append(("not_enough", loop_idx, len(participants), _now()))
                 break
 
             prompts: Dict[str, str] = {}
-            for m in participants:
-                prompts[m["id"]] = build_debate_prompt(m, participants)
-
-            futs = {}
+            seen_versions: Dict[str, Dict[str, int]] = {}
+            peer_fps: Dict[str, Tuple[Tuple[str, int], ...]] = {}
+            # (peer id, unchanged) -> rendered block, shared by every target this round
+            peer_blocks: Dict[Tuple[str, bool], str] = {}
+            asked: List[ModelState] = []
+            skipped: List[ModelState] = []
             for m in participants:
                 mid = m["id"]
-                if m["supports_web"]:
-                    futs[mid] = executor.submit(m["interface"].ask, [prompts[mid]], True)
-                else:
-                    futs[mid] = executor.submit(m["interface"].ask, [prompts[mid]])
+                # Peer answers are versioned, so (id, version) pairs identify exactly what m would be shown
+                fp = peer_fps[mid] = tuple((p["id"], p["version"]) for p in participants if p["id"] != mid)
+                if m["last_agree"] and m["last_peer_fp"] == fp:
+                    # Already agreed with exactly these peer answers; asking again would only repeat it
+                    skipped.append(m)
+                    continue
+                compactions = getattr(m["interface"], "history_compactions", 0)
+                if compactions != m["history_compactions"]:
+                    # The interface summarized older turns, so peer answers sent earlier are no
+                    # longer verbatim in its history: send them in full again
+                    m["sent_versions"].clear()
+                    m["history_compactions"] = compactions
+                seen = seen_versions[mid] = {}
+                prompts[mid] = build_debate_prompt(m, participants, peer_blocks, seen)
+                asked.append(m)
+
+            start_versions = {m["id"]: m["version"] for m in asked}
+            results = await _ask_all(asked, {mid: [p] for mid, p in prompts.items()}, timeout)
+            ts = _now()
 
             # Assume everyone is eligible next round; mark down only on failures in this round.
             for m in models:
                 m["temporarily_down"] = False
 
-            for m in participants:
+            for m in skipped:
+                print(f"{m['name']} skipped (agreed, peers unchanged)")
+                log.append(("skipped", loop_idx, m["name"], ts))
+
+            for m in asked:
                 mid = m["id"]
                 try:
-                    raw = futs[mid].result()
+                    raw = results[mid]
+                    if isinstance(raw, BaseException):
+                        raise raw
                     m["last_struct"] = raw
+                    m["sent_versions"].update(seen_versions[mid])
+                    m["last_peer_fp"] = peer_fps[mid]
                     agree, answer = parse_list_response(raw)
                     m["last_agree"] = bool(agree)
-                    m["last_answer"] = str(answer)
+                    record_answer(m, str(answer))
 
                     print(f"{m['name']} parsed agree={agree} (answer length={len(m['last_answer'])})")
                     log.append(
-                        f"=== Loop {loop_idx}: {m['name']} Evaluation ===\n"
-                        f"Prompt to {m['name']}:\n{prompts[mid]}\n\n"
-                        f"Raw output:\n{raw}\n\n"
-                        f"Parsed -> agree: {agree}, answer length: {len(m['last_answer'])}\n"
-                        f"(timestamp: {datetime.now().isoformat()})"
+                        ("evaluation", loop_idx, m["name"], prompts[mid], raw, agree, len(m["last_answer"]), ts)
                     )
                 except Exception as e:
                     m["temporarily_down"] = True
                     m["last_struct"] = f"[{m['name']} call failed in loop {loop_idx}: {repr(e)}]"
                     print(m["last_struct"])
-                    log.append(
-                        f"=== Loop {loop_idx}: {m['name']} Error ===\n"
-                        f"Prompt to {m['name']}:\n{prompts[mid]}\n\n"
-                        f"Error: {repr(e)}\n"
-                        "This model is considered offline for this round, but will be retried next round.\n"
-                        f"(timestamp: {datetime.now().isoformat()})"
-                    )
+                    log.append(("loop_error", loop_idx, m["name"], prompts[mid], repr(e), ts))
 
-            successful_models = [m for m in models if (not m["temporarily_down"]) and m["last_struct"]]
-            if successful_models and all(m["last_agree"] for m in successful_models):
+            # Single pass with early exit: consensus needs at least one successful model, all agreeing
+            consensus = False
+            any_ok = False
+            for m in models:
+                if m["temporarily_down"] or not m["last_struct"]:
+                    continue
+                any_ok = True
+                if not m["last_agree"]:
+                    break
+            else:
+                consensus = any_ok
+
+            if consensus:
+                successful_models = [m for m in models if (not m["temporarily_down"]) and m["last_struct"]]
                 print("\n✅ All successful models returned agree=True. Consensus reached.")
                 log.append(
-                    "=== Final Agreement (All successful models True) ===\n"
-                    + "\n".join(
-                        [
-                            f"{m['name']} agree={m['last_agree']} answer_len={len(m['last_answer'])}"
-                            for m in successful_models
-                        ]
+                    (
+                        "agreement",
+                        [(m["name"], m["last_agree"], len(m["last_answer"])) for m in successful_models],
+                        ts,
                     )
-                    + f"\n(timestamp: {datetime.now().isoformat()})"
                 )
                 break
 
-        # Final long-form answers (for any model that returned something at least once)
-        final_futs = {}
-        for m in models:
-            if not m["last_answer"] and not m["last_struct"]:
-                continue
+            if min_agree_ratio < 1.0:
+                # Majority exit: enough successful models agree and no dissenter changed its answer
+                successful_models = [m for m in models if (not m["temporarily_down"]) and m["last_struct"]]
+                agreers = sum(1 for m in successful_models if m["last_agree"])
+                dissent_unchanged = all(
+                    m["last_agree"] or m["version"] == start_versions.get(m["id"], m["version"])
+                    for m in successful_models
+                )
+                if successful_models and dissent_unchanged and agreers >= min_agree_ratio * len(successful_models):
+                    print(
+                        f"\n✅ {agreers}/{len(successful_models)} successful models agree and the dissent is "
+                        "unchanged. Stopping early."
+                    )
+                    log.append(
+                        (
+                            "majority",
+                            loop_idx,
+                            min_agree_ratio,
+                            [(m["name"], m["last_agree"], len(m["last_answer"])) for m in successful_models],
+                            ts,
+                        )
+                    )
+                    break
 
-            final_prompt = [build_final_prompt(m)]
-            if m["supports_web"]:
-                final_futs[m["id"]] = executor.submit(m["interface"].ask, final_prompt, True)
-            else:
-                final_futs[m["id"]] = executor.submit(m["interface"].ask, final_prompt)
+        flush_log()
+
+        # Final long-form answers (for any model that returned something at least once and did
+        # not fail its last call; a model that is down would most likely fail this long request too)
+        final_targets = [
+            m for m in models if not m["temporarily_down"] and (m["last_answer"] or m["last_struct"])
+        ]
+        final_results = await _ask_all(
+            final_targets, {m["id"]: [build_final_prompt(m)] for m in final_targets}
+        )
+        ts = _now()
 
-        final_answers_map: Dict[str, str] = {}
         for m in models:
+            if m["temporarily_down"]:
+                log.append(("final_skipped", m["name"], ts))
+
+        final_answers_map: Dict[str, str] = {}
+        for m in final_targets:
             mid = m["id"]
-            if mid not in final_futs:
-                continue
             try:
-                ans = final_futs[mid].result()
+                ans = final_results[mid]
+                if isinstance(ans, BaseException):
+                    raise ans
                 final_answers_map[m["name"]] = ans
-                log.append(
-                    f"=== Final Long Answer from {m['name']} ===\n"
-                    f"{ans}\n"
-                    f"(timestamp: {datetime.now().isoformat()})"
-                )
+                log.append(("final_answer", m["name"], ans, ts))
             except Exception as e:
                 final_answers_map[m["name"]] = f"[{m['name']} final answer failed: {repr(e)}]"
-                log.append(
-                    f"=== Final Long Answer Error from {m['name']} ===\n"
-                    f"Error: {repr(e)}\n"
-                    f"(timestamp: {datetime.now().isoformat()})"
-                )
+                log.append(("final_error", m["name"], repr(e), ts))
+
+        return final_answers_map
+
+    try:
+        log_fh = open(log_filename, "w", encoding="utf-8", buffering=1 << 16)
+        if log_jsonl_filename:
+            jsonl_fh = open(log_jsonl_filename, "wb", buffering=1 << 16)
+        final_answers_map = asyncio.run(run_debate())
+    except BaseException:
+        # Keep whatever the rounds produced before the failure
+        close_log()
+        raise
 
     # Summarize and write outputs
     def pick_final(mid: str) -> str:
-        m = get_model(models, mid)
+        m = models_by_id.get(mid)
         if m is None:
             return f"[Unknown model id: {mid}]"
         if m["name"] in final_answers_map:
@@ -549,25 +1031,20 @@ def close_loop_ask(
     deepseek_final = pick_final("deepseek")
 
     log.append(
-        "=== Final Summary ===\n"
-        + "\n".join(
-            [
-                f"{m['name']} temporarily_down={m['temporarily_down']} has_last_answer={bool(m['last_answer'])}"
-                for m in models
-            ]
-        )
-        + f"\n(timestamp: {datetime.now().isoformat()})"
+        ("summary", [(m["name"], m["temporarily_down"], bool(m["last_answer"])) for m in models], _now())
     )
 
-    write_log_to_file(log, log_filename)
+    close_log()
     write_final_answers_to_file(final_answers_map, final_answers_filename, output_lang)
 
     print(f"\n📝 Dialog log exported to {log_filename}")
+    if log_jsonl_filename:
+        print(f"📝 JSONL log exported to {log_jsonl_filename}")
     print(f"📝 Final answers exported to {final_answers_filename}")
 
-    last_gemini_struct = (get_model(models, "gemini") or {}).get("last_struct", "")
-    last_gpt_struct = (get_model(models, "chatgpt") or {}).get("last_struct", "")
-    last_deepseek_struct = (get_model(models, "deepseek") or {}).get("last_struct", "")
+    last_gemini_struct = (models_by_id.get("gemini") or {}).get("last_struct", "")
+    last_gpt_struct = (models_by_id.get("chatgpt") or {}).get("last_struct", "")
+    last_deepseek_struct = (models_by_id.get("deepseek") or {}).get("last_struct", "")
 
     return (
         gemini_final,
@@ -603,6 +1080,25 @@ if __name__ == "__main__":
         default=10,
         help="Maximum debate loops after the initial round.",
     )
+    parser.add_argument(
+        "--round-timeout",
+        type=float,
+        default=ROUND_TIMEOUT,
+        help="Seconds each model gets to reply per debate round before it is marked down (<= 0 disables; "
+        "default from DEBATE_ROUND_TIMEOUT_S or 120). Initial and final answers are not limited.",
+    )
+    parser.add_argument(
+        "--min-agree-ratio",
+        type=float,
+        default=1.0,
+        help="Stop early once this fraction of models agrees and the dissenting answers stopped changing "
+        "(default 1.0: unanimous agreement only).",
+    )
+    parser.add_argument(
+        "--jsonl-log",
+        action="store_true",
+        help="Also write the dialog log as JSON Lines next to the Markdown log (same name, .jsonl).",
+    )
     args = parser.parse_args()
 
     prompt = load_prompt(prefix=args.prefix, output_lang=args.lang)
@@ -616,8 +1112,6 @@ if __name__ == "__main__":
         log_filename = f"{output_dir}/dialog_log.md"
         final_answers_filename = f"{output_dir}/final_answers.md"
 
-    os.makedirs(output_dir, exist_ok=True)
-
     (
         final_gemini,
         final_gpt,
@@ -631,6 +1125,9 @@ if __name__ == "__main__":
         log_filename=log_filename,
         final_answers_filename=final_answers_filename,
         output_lang=args.lang,
+        round_timeout=args.round_timeout,
+        min_agree_ratio=args.min_agree_ratio,
+        log_jsonl_filename=os.path.splitext(log_filename)[0] + ".jsonl" if args.jsonl_log else None,
     )
 
     if args.lang == "en":
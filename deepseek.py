@@ -1,8 +1,26 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import functools
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from history_compaction import HistoryCompactor, discard_pending_turn
+from http_limits import HTTP_LIMITS
+from response_cache import ResponseCache, cache_lookup, cache_store, open_reply_cache
+
+
+@functools.lru_cache(maxsize=4)
+def _deepseek_client(api_key: str, base_url: str) -> OpenAI:
+    """Return a shared OpenAI-compatible client per (key, base URL) so instances reuse one keep-alive connection pool."""
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=DefaultHttpxClient(limits=HTTP_LIMITS))
+
+
+@functools.lru_cache(maxsize=4)
+def _deepseek_async_client(api_key: str, base_url: str, loop: asyncio.AbstractEventLoop) -> AsyncOpenAI:
+    """Return a shared async client per (key, base URL, event loop); async connections are bound to their loop."""
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=DefaultAsyncHttpxClient(limits=HTTP_LIMITS))
 
 
 class DeepSeekInterface:
@@ -13,6 +31,8 @@ class DeepSeekInterface:
       - Uses DeepSeek's API base URL with the OpenAI Python SDK
       - Maintains a local conversation history (system/user/assistant)
       - Exposes a reset() method to clear the session state
+      - Summarizes the middle of the history once it exceeds history_token_limit (rough estimate)
+      - Optional persistent exact-match reply cache (enable_cache) for deterministic settings
 
     Notes:
       - DeepSeek models accessed via Chat Completions do not use the OpenAI Responses API.
@@ -28,6 +48,9 @@ class DeepSeekInterface:
         system_prompt: Optional[str] = None,
         base_url: str = "https://api.deepseek.com",
         enable_thinking: bool = True,
+        history_token_limit: Optional[int] = 80000,
+        enable_cache: bool = False,
+        cache_path: str = ".llm_cache/responses.sqlite3",
     ) -> None:
         """
         Args:
@@ -38,14 +61,30 @@ class DeepSeekInterface:
             system_prompt: Optional system prompt inserted at session start.
             base_url: DeepSeek API base URL for the OpenAI-compatible endpoint.
             enable_thinking: If True, requests the model to include reasoning metadata when available.
+            history_token_limit: Estimated token count above which older turns are replaced by a
+                model-written summary before the next request; None disables compaction.
+            enable_cache: If True (and temperature is 0), replies are cached on disk keyed by the full
+                request, so re-running an identical conversation costs no API calls.
+            cache_path: SQLite file backing the reply cache.
         """
-        self._client = OpenAI(api_key=api_key, base_url=base_url)
+        self._api_key = api_key
+        self._base_url = base_url
+        self._client = _deepseek_client(api_key, base_url)
         self._model_name = model_name
         self._temperature = float(temperature)
         self._max_tokens = int(max_tokens)
         self._enable_thinking = bool(enable_thinking)
+        self._compactor: HistoryCompactor[Dict[str, str]] = HistoryCompactor(
+            history_token_limit,
+            role_of=lambda msg: msg["role"],
+            text_of=lambda msg: msg["content"],
+            model_turn=lambda text: {"role": "assistant", "content": text},
+        )
+        self._cache: Optional[ResponseCache] = open_reply_cache(enable_cache, self._temperature, cache_path)
 
         self._system_prompt = system_prompt
+        # Leading turns never compacted: the system prompt (if any) and the original question
+        self._kept_turns = 2 if system_prompt else 1
         self._messages: List[Dict[str, str]] = []
         if system_prompt:
             self._messages.append({"role": "system", "content": system_prompt})
@@ -64,21 +103,35 @@ class DeepSeekInterface:
         If a single structured object (dict/list) is provided, it is stringified.
         Otherwise, elements are stringified and concatenated with spaces.
         """
-        if len(prompt_elements) == 1 and isinstance(prompt_elements[0], (dict, list)):
-            return str(prompt_elements[0])
-        return " ".join(str(p) for p in prompt_elements)
+        if len(prompt_elements) == 1:
+            # Common case: a single prompt string needs no join (dict/list elements are stringified)
+            element = prompt_elements[0]
+            return element if isinstance(element, str) else str(element)
+        return " ".join(map(str, prompt_elements))
 
-    def ask(self, prompt_elements: List[Any], use_web_search: bool = True) -> str:
-        """
-        Send a user message and return the assistant reply text.
+    @property
+    def history_compactions(self) -> int:
+        """Number of times older turns were replaced by a summary (content sent before is no longer verbatim)."""
+        return self._compactor.compactions
 
-        Args:
-            prompt_elements: Prompt parts to be joined into a single message.
-            use_web_search: Accepted for interface compatibility, ignored (not supported here).
+    def _compaction_request(self) -> Optional[Dict[str, Any]]:
+        """Return the summary request kwargs if the history is due for compaction, else None."""
+        prompt = self._compactor.summary_prompt(self._messages, self._kept_turns)
+        if prompt is None:
+            return None
+        return {
+            "model": self._model_name,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": self._max_tokens,
+            "temperature": self._temperature,
+        }
 
-        Returns:
-            The assistant's message content as a string.
-        """
+    def _apply_summary(self, response: Any) -> None:
+        """Replace the turns covered by the summary request with the returned summary."""
+        self._compactor.apply(self._messages, self._kept_turns, response.choices[0].message.content or "")
+
+    def _build_request(self, prompt_elements: List[Any]) -> Dict[str, Any]:
+        """Append the user message to the history and return the Chat Completions kwargs."""
         user_text = self._normalize_user_text(prompt_elements)
         self._messages.append({"role": "user", "content": user_text})
 
@@ -86,16 +139,126 @@ class DeepSeekInterface:
         if self._enable_thinking:
             extra_body = {"thinking": {"type": "enabled"}}
 
-        response = self._client.chat.completions.create(
-            model=self._model_name,
-            messages=self._messages,
-            max_tokens=self._max_tokens,
-            temperature=self._temperature,
-            extra_body=extra_body,
+        return {
+            "model": self._model_name,
+            "messages": self._messages,
+            "max_tokens": self._max_tokens,
+            "temperature": self._temperature,
+            "extra_body": extra_body,
+        }
+
+    def _cache_lookup(self, request: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Return (cache key, cached reply) for a request built by _build_request.
+
+        On a hit the reply is recorded in the history just like a live one. The key is None when
+        caching is disabled.
+        """
+        key, cached = cache_lookup(
+            self._cache,
+            request["model"],
+            request["messages"],
+            request["max_tokens"],
+            request["temperature"],
+            request["extra_body"],
         )
+        if cached is not None:
+            self._messages.append({"role": "assistant", "content": cached})
+        return key, cached
 
+    def _handle_response(self, response: Any) -> str:
+        """Record the assistant reply in the history and return its text."""
         msg = response.choices[0].message
         content = msg.content or ""
 
         self._messages.append({"role": "assistant", "content": content})
         return content
+
+    def ask(self, prompt_elements: List[Any], use_web_search: bool = True) -> str:
+        """
+        Send a user message and return the assistant reply text.
+
+        Args:
+            prompt_elements: Prompt parts to be joined into a single message.
+            use_web_search: Accepted for interface compatibility, ignored (not supported here).
+
+        Returns:
+            The assistant's message content as a string.
+        """
+        compaction = self._compaction_request()
+        if compaction is not None:
+            self._apply_summary(self._client.chat.completions.create(**compaction))
+
+        request = self._build_request(prompt_elements)
+        key, cached = self._cache_lookup(request)
+        if cached is not None:
+            return cached
+
+        try:
+            response = self._client.chat.completions.create(**request)
+        except BaseException:
+            discard_pending_turn(self._messages)
+            raise
+        content = self._handle_response(response)
+        cache_store(self._cache, key, content)
+        return content
+
+    def _async_client(self) -> AsyncOpenAI:
+        """Return the shared async client for the running event loop."""
+        return _deepseek_async_client(self._api_key, self._base_url, asyncio.get_running_loop())
+
+    async def ask_async(self, prompt_elements: List[Any], use_web_search: bool = True) -> str:
+        """Async variant of ask() for concurrent fan-out; same arguments and history handling."""
+        compaction = self._compaction_request()
+        if compaction is not None:
+            self._apply_summary(await self._async_client().chat.completions.create(**compaction))
+
+        request = self._build_request(prompt_elements)
+        key, cached = self._cache_lookup(request)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await self._async_client().chat.completions.create(**request)
+        except BaseException:
+            # Also covers cancellation by a round timeout
+            discard_pending_turn(self._messages)
+            raise
+        content = self._handle_response(response)
+        cache_store(self._cache, key, content)
+        return content
+
+    async def ask_stream_async(self, prompt_elements: List[Any], use_web_search: bool = True) -> AsyncIterator[str]:
+        """
+        Streaming variant of ask_async(): yields reply content deltas as they arrive.
+
+        The full reply is recorded in the history once the stream is exhausted.
+        """
+        compaction = self._compaction_request()
+        if compaction is not None:
+            self._apply_summary(await self._async_client().chat.completions.create(**compaction))
+
+        request = self._build_request(prompt_elements)
+        key, cached = self._cache_lookup(request)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks: List[str] = []
+        try:
+            stream = await self._async_client().chat.completions.create(stream=True, **request)
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+        except BaseException:
+            # Also covers cancellation by a round timeout and a consumer that stops early
+            discard_pending_turn(self._messages)
+            raise
+
+        content = "".join(chunks)
+        self._messages.append({"role": "assistant", "content": content})
+        cache_store(self._cache, key, content)
@@ -1,11 +1,37 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
 import io
-from typing import Any, List, Optional
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 from google import genai
 from google.genai import types
-from PIL import Image
+from PIL import Image, ImageOps
+
+from history_compaction import HistoryCompactor
+from http_limits import HTTP_LIMITS
+from response_cache import ResponseCache, cache_lookup, cache_store, open_reply_cache
+
+_EMPTY_RESPONSE = "[Gemini error: empty response]"
+_EMPTY_PROMPT = "[Gemini error: empty prompt]"
+
+# Encoded image parts remembered per interface (least recently used ones are dropped first)
+_MAX_IMAGE_PARTS = 32
+
+
+@functools.lru_cache(maxsize=4)
+def _genai_client(api_key: str) -> genai.Client:
+    """Return a shared genai client per API key for sync calls, so instances reuse one keep-alive pool."""
+    return genai.Client(api_key=api_key, http_options=types.HttpOptions(client_args={"limits": HTTP_LIMITS}))
+
+
+@functools.lru_cache(maxsize=4)
+def _genai_async_client(api_key: str, loop: asyncio.AbstractEventLoop) -> genai.Client:
+    """Return a shared genai client per (key, event loop) for aio calls; async connections are bound to their loop."""
+    return genai.Client(api_key=api_key, http_options=types.HttpOptions(async_client_args={"limits": HTTP_LIMITS}))
 
 
 class GeminiInterface:
@@ -14,8 +40,13 @@ class GeminiInterface:
 
     Features:
       - Accepts mixed inputs: text and PIL images
-      - Maintains a simple in-memory conversation history
+      - Maintains a simple in-memory conversation history; turns are stored exactly as sent/received
+        and never re-rendered, so every request extends the previous one byte-for-byte and Gemini's
+        implicit context caching can reuse the shared prefix (only a compaction resets it)
       - Optionally enables Google's managed web search grounding tool
+      - Summarizes the middle of the history once it exceeds history_token_limit (rough estimate)
+      - ask_stream()/ask_stream_async() yield the reply text as it is generated
+      - Optional persistent exact-match reply cache (enable_cache) for deterministic settings
     """
 
     def __init__(
@@ -25,6 +56,11 @@ class GeminiInterface:
         temperature: float = 0.0,
         max_tokens: int = 2048,
         enable_search_tool: bool = True,
+        history_token_limit: Optional[int] = 80000,
+        jpeg_quality: Optional[int] = 85,
+        max_image_side: Optional[int] = 1568,
+        enable_cache: bool = False,
+        cache_path: str = ".llm_cache/responses.sqlite3",
     ) -> None:
         """
         Args:
@@ -33,25 +69,56 @@ class GeminiInterface:
             temperature: Sampling temperature for generation.
             max_tokens: Maximum number of tokens to generate for a single response.
             enable_search_tool: If True, configures the Google Search grounding tool.
+            history_token_limit: Estimated token count above which older turns are replaced by a
+                model-written summary before the next request; None disables compaction.
+            jpeg_quality: JPEG quality for opaque images (encoded much faster and smaller than PNG);
+                None sends every image as lossless PNG.
+            max_image_side: Images whose longer side exceeds this are downscaled before upload (the
+                model downsamples them anyway, so larger uploads only cost bytes and tokens); None
+                sends images at their original size.
+            enable_cache: If True (and temperature is 0), replies are cached on disk keyed by the full
+                request (history, images, search flag), so re-running an identical conversation costs
+                no API calls.
+            cache_path: SQLite file backing the reply cache.
         """
-        self._client = genai.Client(api_key=api_key)
+        self._api_key = api_key
+        self._client = _genai_client(api_key)
         self._model_name = model_name
         self._temperature = float(temperature)
         self.max_tokens = int(max_tokens)
+        self._jpeg_quality = jpeg_quality
+        self._max_image_side = max_image_side
+        self._cache: Optional[ResponseCache] = open_reply_cache(enable_cache, self._temperature, cache_path)
 
         self._search_tool: Optional[types.Tool] = None
         if enable_search_tool:
             self._search_tool = types.Tool(google_search=types.GoogleSearch())
+        # Built configs by (search tool attached, max_tokens); the SDK copies a config before use
+        self._config_cache: Dict[Tuple[bool, int], types.GenerateContentConfig] = {}
 
         self._history: List[types.Content] = []
+        # Encoded image parts by image digest (LRU, at most _MAX_IMAGE_PARTS), so an image passed
+        # again is neither re-encoded nor sent as different bytes (which would break the cached prefix)
+        self._image_parts: OrderedDict[bytes, types.Part] = OrderedDict()
+        self._compactor: HistoryCompactor[types.Content] = HistoryCompactor(
+            history_token_limit,
+            role_of=lambda content: content.role,
+            text_of=self._content_text,
+            model_turn=lambda text: types.ModelContent(parts=[types.Part.from_text(text=text)]),
+        )
+
+    def _aio(self) -> genai.client.AsyncClient:
+        """Return the aio surface of the genai client bound to the running event loop."""
+        return _genai_async_client(self._api_key, asyncio.get_running_loop()).aio
 
     def reset(self) -> None:
         """Clear conversation history (equivalent to starting a new session)."""
         self._history.clear()
+        self._image_parts.clear()
 
     def _build_config(self, use_web_search: bool) -> types.GenerateContentConfig:
         """
-        Create a per-request GenerateContentConfig.
+        Return the GenerateContentConfig for a request (built once per distinct setting).
 
         Args:
             use_web_search: If True, attach the web search tool (when configured).
@@ -59,35 +126,221 @@ class GeminiInterface:
         Returns:
             A configured GenerateContentConfig instance.
         """
-        cfg_kwargs = {
-            "temperature": self._temperature,
-            "max_output_tokens": self.max_tokens,
-        }
-        if use_web_search and self._search_tool is not None:
-            cfg_kwargs["tools"] = [self._search_tool]
-        return types.GenerateContentConfig(**cfg_kwargs)
+        with_search = bool(use_web_search and self._search_tool is not None)
+        key = (with_search, self.max_tokens)
+        config = self._config_cache.get(key)
+        if config is None:
+            cfg_kwargs = {
+                "temperature": self._temperature,
+                "max_output_tokens": self.max_tokens,
+            }
+            if with_search:
+                cfg_kwargs["tools"] = [self._search_tool]
+            config = self._config_cache[key] = types.GenerateContentConfig(**cfg_kwargs)
+        return config
 
     @staticmethod
-    def _image_to_part(img: Image.Image, mime_type: str = "image/png") -> types.Part:
+    def _image_to_part(
+        img: Image.Image, jpeg_quality: Optional[int] = 85, max_side: Optional[int] = 1568
+    ) -> types.Part:
         """
         Convert a PIL image into a Gemini Part.
 
+        The EXIF orientation is applied and the image is downscaled to fit max_side; metadata is not
+        carried over. Opaque 8-bit colour/greyscale images are sent as JPEG, which Pillow encodes
+        several times faster and into a much smaller upload; everything else (transparency, palette,
+        16-bit or float samples) stays lossless PNG.
+
         Args:
-            img: PIL Image.
-            mime_type: MIME type for encoding; defaults to PNG.
+            img: PIL Image (never modified in place).
+            jpeg_quality: JPEG quality for opaque images; None always uses PNG.
+            max_side: Maximum length of the longer side in pixels; None keeps the original size.
 
         Returns:
             types.Part containing the encoded image bytes.
         """
+        # exif_transpose always returns a new image (a plain copy when there is nothing to rotate),
+        # so the caller's image is safe from the in-place thumbnail below
+        img = ImageOps.exif_transpose(img)
+        if max_side is not None and max(img.size) > max_side:
+            img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
         buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        buf.seek(0)
-        return types.Part.from_bytes(data=buf.read(), mime_type=mime_type)
+        if jpeg_quality is not None and img.mode in ("RGB", "L", "CMYK", "YCbCr") and "transparency" not in img.info:
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.save(buf, format="JPEG", quality=jpeg_quality)
+            mime_type = "image/jpeg"
+        else:
+            img.save(buf, format="PNG")
+            mime_type = "image/png"
+        return types.Part.from_bytes(data=buf.getvalue(), mime_type=mime_type)
+
+    def _image_part(self, img: Image.Image) -> types.Part:
+        """Return the Part for img, reusing the one built earlier for an identical image."""
+        h = hashlib.blake2b(img.tobytes(), digest_size=16)
+        # Everything besides the raw pixel data that changes the encoded image: palette ("P" pixels
+        # are only indices), transparency, and the orientation applied during encoding
+        palette = img.getpalette()
+        if palette is not None:
+            h.update(bytes(palette))
+        h.update(f"{img.mode}{img.size}{img.info.get('transparency')!r}{img.getexif().get(0x0112)}".encode())
+        digest = h.digest()
+
+        part = self._image_parts.get(digest)
+        if part is not None:
+            self._image_parts.move_to_end(digest)
+            return part
+        part = self._image_parts[digest] = self._image_to_part(img, self._jpeg_quality, self._max_image_side)
+        if len(self._image_parts) > _MAX_IMAGE_PARTS:
+            self._image_parts.popitem(last=False)
+        return part
+
+    @staticmethod
+    def _content_text(content: types.Content) -> str:
+        """Concatenate the text parts of a history entry (images and thought summaries are skipped)."""
+        return "".join(
+            p.text for p in (content.parts or []) if getattr(p, "text", None) and not getattr(p, "thought", None)
+        )
+
+    @property
+    def history_compactions(self) -> int:
+        """Number of times older turns were replaced by a summary."""
+        return self._compactor.compactions
+
+    def _compaction_request(self) -> Optional[Dict[str, Any]]:
+        """
+        Return the summary request kwargs if the history is due for compaction, else None.
+
+        The first user turn (the original question) and the latest exchange are kept verbatim.
+        """
+        prompt = self._compactor.summary_prompt(self._history, 1)
+        if prompt is None:
+            return None
+        return {"model": self._model_name, "contents": prompt, "config": self._build_config(use_web_search=False)}
+
+    def _apply_summary(self, resp: Any) -> None:
+        """Replace the turns covered by the summary request with the returned summary."""
+        self._compactor.apply(self._history, 1, getattr(resp, "text", None) or "")
+
+    def _build_contents(self, prompt_elements: List[Any]) -> Tuple[types.Content, List[types.Content]]:
+        """Build the user message and the full request contents (history + user message)."""
+        parts: List[types.Part] = []
+        text_parts: List[str] = []
+
+        # One pass: encode images, stringify everything else; the joined text goes in front.
+        for element in prompt_elements:
+            if isinstance(element, Image.Image):
+                parts.append(self._image_part(element))
+            else:
+                text_parts.append(str(element))
+
+        if text_parts:
+            parts = [types.Part.from_text(text=" ".join(text_parts)), *parts]
+
+        user_msg = types.UserContent(parts=parts)
+        contents: List[types.Content] = [*self._history, user_msg]
+        return user_msg, contents
+
+    def _cache_lookup(
+        self, user_msg: types.Content, contents: List[types.Content], use_web_search: bool
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Return (cache key, cached reply) for a request built by _build_contents.
+
+        On a hit the exchange is recorded in the history just like a live one. The key is None when
+        caching is disabled.
+        """
+        if self._cache is None:
+            return None, None  # skip serializing the history when caching is off
+        # Model turns are keyed by their text only: a replayed turn carries just the text, while a
+        # live one may also hold grounding/thought metadata, and both must map to the same key
+        turns = [
+            self._content_text(c) if c.role == "model" else c.model_dump(mode="json", exclude_none=True)
+            for c in contents
+        ]
+        key, cached = cache_lookup(
+            self._cache,
+            self._model_name,
+            turns,
+            self.max_tokens,
+            self._temperature,
+            use_web_search and self._search_tool is not None,
+        )
+        if cached is not None:
+            self._history.append(user_msg)
+            self._history.append(types.ModelContent(parts=[types.Part.from_text(text=cached)]))
+        return key, cached
+
+    def _cache_store(self, key: Optional[str], text: str) -> None:
+        """Remember a live reply under key (the empty-response marker is never cached)."""
+        if text != _EMPTY_RESPONSE:
+            cache_store(self._cache, key, text)
+
+    @staticmethod
+    def _candidate_content(resp: Any) -> Optional[types.Content]:
+        """Return the content of the first candidate, if any."""
+        candidates = getattr(resp, "candidates", None)
+        return candidates[0].content if candidates else None
+
+    @staticmethod
+    def _extract_text(resp: Any, content: Optional[types.Content]) -> Optional[str]:
+        """Return resp.text, falling back to the concatenated text parts of content."""
+        text = getattr(resp, "text", None)
+        if text:
+            return text
+        if content is not None and content.parts:
+            return "".join(p.text for p in content.parts if getattr(p, "text", None)) or None
+        return None
+
+    def _handle_response(self, user_msg: types.Content, resp: Any) -> str:
+        """Record the exchange in the history and extract the response text."""
+        content = self._candidate_content(resp)
+        # Update history (best effort).
+        self._history.append(user_msg)
+        if content:
+            self._history.append(content)
+
+        return self._extract_text(resp, content) or _EMPTY_RESPONSE
 
     @staticmethod
-    def _coerce_text_parts(prompt_elements: List[Any]) -> List[str]:
-        """Stringify all non-image elements."""
-        return [str(x) for x in prompt_elements if not isinstance(x, Image.Image)]
+    def _merge_stream_parts(parts: List[types.Part]) -> List[types.Part]:
+        """
+        Join consecutive text fragments of a streamed reply, as the non-streaming reply carries them.
+
+        A fragment is folded into the previous text part only if it has the same thought flag and
+        carries nothing but text; parts with a thought signature or non-text data are kept as-is.
+        """
+        merged: List[types.Part] = []
+        for part in parts:
+            prev = merged[-1] if merged else None
+            if (
+                prev is not None
+                and prev.text is not None
+                and part.text is not None
+                and prev.thought == part.thought
+                and part.model_dump(exclude_none=True).keys() <= {"text", "thought"}
+            ):
+                merged[-1] = prev.model_copy(update={"text": prev.text + part.text})
+            else:
+                merged.append(part)
+        return merged
+
+    def _finish_stream(
+        self, user_msg: types.Content, chunks: List[str], parts: List[types.Part], key: Optional[str]
+    ) -> None:
+        """
+        Record a fully streamed exchange in the history (and the cache, if enabled).
+
+        The model turn is rebuilt from the streamed candidate parts, so thought signatures and other
+        non-text parts are kept just like the candidate content ask() records.
+        """
+        self._history.append(user_msg)
+        if parts:
+            self._history.append(types.Content(role="model", parts=self._merge_stream_parts(parts)))
+        text = "".join(chunks)
+        if text:
+            self._cache_store(key, text)
 
     def ask(self, prompt_elements: List[Any], use_web_search: bool = True) -> str:
         """
@@ -101,51 +354,117 @@ class GeminiInterface:
             use_web_search: If True, enable web search grounding (when configured).
 
         Returns:
-            The model's response text, or a short error string if no text is present.
+            The model's response text, or a short error string if no text is present (or the prompt
+            is empty, in which case no request is made).
         """
-        parts: List[types.Part] = []
+        if not prompt_elements:
+            return _EMPTY_PROMPT
 
-        # Gather images first, then insert a single text part (if any) at the front.
-        for element in prompt_elements:
-            if isinstance(element, Image.Image):
-                parts.append(self._image_to_part(element))
+        compaction = self._compaction_request()
+        if compaction is not None:
+            self._apply_summary(self._client.models.generate_content(**compaction))
 
-        text_parts = self._coerce_text_parts(prompt_elements)
-        if text_parts:
-            user_text = " ".join(text_parts)
-            parts.insert(0, types.Part.from_text(text=user_text))
+        user_msg, contents = self._build_contents(prompt_elements)
+        key, cached = self._cache_lookup(user_msg, contents, use_web_search)
+        if cached is not None:
+            return cached
 
-        if not parts:
-            parts.append(types.Part.from_text(text=""))
+        resp = self._client.models.generate_content(
+            model=self._model_name,
+            contents=contents,
+            config=self._build_config(use_web_search=use_web_search),
+        )
+        text = self._handle_response(user_msg, resp)
+        self._cache_store(key, text)
+        return text
 
-        user_msg = types.UserContent(parts=parts)
-        contents: List[types.Content] = [*self._history, user_msg]
+    async def ask_async(self, prompt_elements: List[Any], use_web_search: bool = True) -> str:
+        """Async variant of ask() for concurrent fan-out (uses the client's aio surface)."""
+        if not prompt_elements:
+            return _EMPTY_PROMPT
 
-        resp = self._client.models.generate_content(
+        compaction = self._compaction_request()
+        if compaction is not None:
+            self._apply_summary(await self._aio().models.generate_content(**compaction))
+
+        user_msg, contents = self._build_contents(prompt_elements)
+        key, cached = self._cache_lookup(user_msg, contents, use_web_search)
+        if cached is not None:
+            return cached
+
+        resp = await self._aio().models.generate_content(
             model=self._model_name,
             contents=contents,
             config=self._build_config(use_web_search=use_web_search),
         )
+        text = self._handle_response(user_msg, resp)
+        self._cache_store(key, text)
+        return text
 
-        # Update history (best effort).
-        self._history.append(user_msg)
-        if getattr(resp, "candidates", None) and resp.candidates and resp.candidates[0].content:
-            self._history.append(resp.candidates[0].content)
+    def ask_stream(self, prompt_elements: List[Any], use_web_search: bool = True) -> Iterator[str]:
+        """
+        Streaming variant of ask(): yields response text chunks as they arrive.
 
-        # Prefer resp.text if present.
-        text = getattr(resp, "text", None)
-        if text:
-            return text
+        The exchange is recorded in the history once the stream is exhausted.
+        """
+        if not prompt_elements:
+            yield _EMPTY_PROMPT
+            return
 
-        # Fallback: concatenate text fields from returned parts.
-        if getattr(resp, "candidates", None) and resp.candidates and resp.candidates[0].content:
-            cand_parts = resp.candidates[0].content.parts or []
-            chunks: List[str] = []
-            for p in cand_parts:
-                t = getattr(p, "text", None)
-                if t:
-                    chunks.append(t)
-            if chunks:
-                return "".join(chunks)
-
-        return "[Gemini error: empty response]"
+        compaction = self._compaction_request()
+        if compaction is not None:
+            self._apply_summary(self._client.models.generate_content(**compaction))
+
+        user_msg, contents = self._build_contents(prompt_elements)
+        key, cached = self._cache_lookup(user_msg, contents, use_web_search)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks: List[str] = []
+        parts: List[types.Part] = []
+        for chunk in self._client.models.generate_content_stream(
+            model=self._model_name,
+            contents=contents,
+            config=self._build_config(use_web_search=use_web_search),
+        ):
+            content = self._candidate_content(chunk)
+            if content is not None and content.parts:
+                parts.extend(content.parts)
+            text = chunk.text
+            if text:
+                chunks.append(text)
+                yield text
+        self._finish_stream(user_msg, chunks, parts, key)
+
+    async def ask_stream_async(self, prompt_elements: List[Any], use_web_search: bool = True) -> AsyncIterator[str]:
+        """Async variant of ask_stream() (uses the client's aio surface)."""
+        if not prompt_elements:
+            yield _EMPTY_PROMPT
+            return
+
+        compaction = self._compaction_request()
+        if compaction is not None:
+            self._apply_summary(await self._aio().models.generate_content(**compaction))
+
+        user_msg, contents = self._build_contents(prompt_elements)
+        key, cached = self._cache_lookup(user_msg, contents, use_web_search)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks: List[str] = []
+        parts: List[types.Part] = []
+        async for chunk in await self._aio().models.generate_content_stream(
+            model=self._model_name,
+            contents=contents,
+            config=self._build_config(use_web_search=use_web_search),
+        ):
+            content = self._candidate_content(chunk)
+            if content is not None and content.parts:
+                parts.extend(content.parts)
+            text = chunk.text
+            if text:
+                chunks.append(text)
+                yield text
+        self._finish_stream(user_msg, chunks, parts, key)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+Turn = TypeVar("Turn")
+
+SUMMARY_INSTRUCTION = (
+    "Briefly summarize the following conversation so that it can be continued from the summary alone. "
+    "Keep every position taken, the evidence and links cited, and any open disagreements.\n\n"
+)
+
+
+class HistoryCompactor(Generic[Turn]):
+    """
+    Summary-based compaction of an in-memory chat history, shared by the model interfaces.
+
+    Once the estimated size of the history exceeds token_limit, the turns between the leading ones
+    (system prompt, original question) and the latest exchange are replaced by one model-written
+    summary turn. The cut always falls on turn boundaries and the summary is a model turn, so the
+    user/model alternation strict endpoints expect is preserved and the rest of the history stays
+    byte-for-byte unchanged.
+
+    Interfaces supply only their message shape: how to read a turn's role and text, and how to build
+    a model-role turn carrying some text.
+    """
+
+    def __init__(
+        self,
+        token_limit: Optional[int],
+        role_of: Callable[[Turn], str],
+        text_of: Callable[[Turn], str],
+        model_turn: Callable[[str], Turn],
+    ) -> None:
+        """
+        Args:
+            token_limit: Estimated token count above which the history is compacted; None disables it.
+            role_of: Returns the role name of a turn (used in the transcript sent for summarizing).
+            text_of: Returns the text of a turn (non-text content is not counted or summarized).
+            model_turn: Builds a model/assistant-role turn holding the given text.
+        """
+        self.token_limit = token_limit
+        self._role_of = role_of
+        self._text_of = text_of
+        self._model_turn = model_turn
+        # Incremented on every compaction, so callers can tell that content they sent earlier is no
+        # longer verbatim in the history
+        self.compactions = 0
+
+    def summary_prompt(self, history: List[Turn], keep: int) -> Optional[str]:
+        """
+        Return the prompt asking for a summary of history[keep:-2], or None if no compaction is due.
+
+        Args:
+            history: The interface's history list.
+            keep: Number of leading turns that are always kept verbatim.
+        """
+        if self.token_limit is None:
+            return None
+        texts = [self._text_of(turn) for turn in history]
+        # Rough estimate (~2 characters per token for mixed English/Chinese text), no tokenizer needed
+        if sum(map(len, texts)) // 2 <= self.token_limit:
+            return None
+
+        middle = history[keep:-2]
+        if len(middle) < 2:
+            return None
+        transcript = "\n\n".join(f"{self._role_of(turn)}: {text}" for turn, text in zip(middle, texts[keep:-2]))
+        return SUMMARY_INSTRUCTION + transcript
+
+    def apply(self, history: List[Turn], keep: int, summary: str) -> None:
+        """Replace the turns covered by summary_prompt(history, keep) with one model turn carrying summary."""
+        history[keep:-2] = [self._model_turn(f"(Summary of the earlier conversation)\n{summary}")]
+        self.compactions += 1
+
+
+def discard_pending_turn(messages: List[Dict[str, Any]]) -> None:
+    """
+    Drop the trailing user turn of a chat-completions message list whose request failed or was cancelled.
+
+    Otherwise the next request would carry two user turns in a row, which strict endpoints reject
+    and which would break the alternation compaction relies on.
+    """
+    if messages and messages[-1]["role"] == "user":
+        messages.pop()
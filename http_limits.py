@@ -0,0 +1,8 @@
+from __future__ import annotations
+
+import httpx
+
+# Connection-pool limits shared by every model interface's HTTP clients. Idle connections are kept
+# around between debate rounds (httpx's default expiry is only 5 s, shorter than a typical model
+# response), so each round reuses the warm TCP/TLS session.
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=8, keepalive_expiry=300.0)
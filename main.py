@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import functools
 import os
 from typing import Optional
 
@@ -8,9 +9,10 @@ from bazi import BaZiAutomation
 from close_loop import close_loop_ask
 
 
+@functools.lru_cache(maxsize=32)
 def _read_text(path: str) -> str:
     """
-    Read a UTF-8 text file and return its content.
+    Read a UTF-8 text file and return its content (cached: templates are read once per process).
 
     Args:
         path: Path to the text file.
@@ -22,6 +24,12 @@ def _read_text(path: str) -> str:
         return f.read()
 
 
+@functools.lru_cache(maxsize=1)
+def _get_automator() -> BaZiAutomation:
+    """Return the process-wide BaZiAutomation (it is stateless, and sharing it keeps its prompt cache warm)."""
+    return BaZiAutomation()
+
+
 def _ensure_dir(path: str) -> None:
     """Create a directory if it does not already exist."""
     os.makedirs(path, exist_ok=True)
@@ -48,8 +56,7 @@ def build_full_prompt(
     Returns:
         A single concatenated prompt string.
     """
-    automator = BaZiAutomation()
-    profile = automator.generate_prompt(year, month, day, hour, minute, gender)
+    profile = _get_automator().generate_prompt(year, month, day, hour, minute, gender)
 
     prompt_1 = _read_text("prompt_template/prompt_1.txt")
     prompt_2 = _read_text("prompt_template/prompt_2.txt")
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    Persistent exact-match cache for model replies, stored in a single SQLite file.
+
+    Keys are hashes of everything that determines a deterministic reply (model, full message list,
+    sampling settings), so a hit is only possible for a byte-identical request. Uses only the
+    standard library; safe to share between threads (one connection guarded by a lock).
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path: SQLite file to use; its directory is created if missing.
+        """
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Hash JSON-serializable request parts into a cache key (dict order does not matter)."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached reply for key, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str) -> None:
+        """Store (or replace) the reply for key."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)", (key, value))
+
+
+@functools.lru_cache(maxsize=None)
+def open_cache(path: str = ".llm_cache/responses.sqlite3") -> ResponseCache:
+    """Return the shared ResponseCache for path (one connection per file per process)."""
+    return ResponseCache(path)
+
+
+def open_reply_cache(enabled: bool, temperature: float, path: str) -> Optional[ResponseCache]:
+    """Return the shared cache for path if replies should be cached, else None."""
+    # Only deterministic requests are worth replaying from the cache
+    return open_cache(path) if enabled and temperature == 0.0 else None
+
+
+def cache_lookup(cache: Optional[ResponseCache], *key_parts: Any) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Return (cache key, cached reply) for a request described by key_parts.
+
+    Both are None when caching is disabled (cache is None); the reply is None on a miss.
+    """
+    if cache is None:
+        return None, None
+    key = ResponseCache.make_key(*key_parts)
+    return key, cache.get(key)
+
+
+def cache_store(cache: Optional[ResponseCache], key: Optional[str], reply: str) -> None:
+    """Remember a live reply under key (skipped when caching is off or the reply is empty)."""
+    if cache is not None and key is not None and reply:
+        cache.set(key, reply)